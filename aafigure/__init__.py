@@ -8,4 +8,4 @@
 AAFigure package.
 """
 
-from .aafigure import process, render, UnsupportedFormatError, AsciiArtImage
+from .aafigure import process, render, recognize_lines, UnsupportedFormatError, AsciiArtImage
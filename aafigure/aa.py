@@ -10,6 +10,7 @@ black and white image.
 """
 
 import sys
+from .shapes import Line
 
 
 class AsciiOutputVisitor:
@@ -24,6 +25,8 @@ class AsciiOutputVisitor:
         self.scale = options['scale']
 
     def visit_image(self, aa_image):
+        # the coordinates of the shapes are in units of aa_image.unit
+        self.scale = self.options['scale'] * aa_image.unit
         self.visit_shapes(aa_image.shapes)
         self.options['file_like'].write(self.create_image())
 
@@ -71,7 +74,20 @@ class AsciiOutputVisitor:
                 self.image[int(x), y] = '#'
             x += m
 
+    def visit_polyline(self, polyline):
+        points = polyline.points
+        if polyline.closed:
+            points = points + points[:1]
+        for start, end in zip(points, points[1:]):
+            self.visit_line(Line(start, end))
+
     def visit_rectangle(self, rectangle):
+        if not rectangle.filled:
+            # arcs of rounded corners are not drawn, as for Arc shapes
+            for shape in rectangle.outline():
+                if isinstance(shape, Line):
+                    self.visit_line(shape)
+            return
         x1, x2 = rectangle.p1.x * self.scale, rectangle.p2.x * self.scale
         y1, y2 = rectangle.p1.y * self.scale, rectangle.p2.y * self.scale
         if x1 > x2:
@@ -13,9 +13,16 @@ See svg.py and aa.py for output modules, that can render the parsed structure.
 """
 # import codecs
 from .error import UnsupportedFormatError
-from .shapes import Line, Point, Circle, Label, Arc, Rectangle, group  # point
+from .shapes import Line, Point, Circle, Label, Arc, Rectangle, Polyline, group  # point
+from . import simplify
+from .table import ShapeTable
+from .spatial import SpatialIndex
 from unicodedata import east_asian_width
+from array import array
+import multiprocessing
+import re
 import sys
+import types
 
 
 try:
@@ -23,13 +30,51 @@ try:
 except NameError:
     basestring = str
 
+try:
+    unichr
+except NameError:
+    unichr = chr
+
 NOMINAL_SIZE = 2
 
+# the recognizers create many shapes, they skip the argument conversion of
+# the constructors: ``new(Point, (x, y))`` is ``Point(x, y)``
+new = tuple.__new__
+
+# with the fixed_point option, coordinates are integers in this fraction of
+# the cell height (horizontal ones are multiplied with the aspect ratio, so
+# that a unit has the same size in both directions). it is divisible by 2, 3
+# and 4, so that the positions used by the shapes (e.g. the triple hatches)
+# are exact
+FIXED_POINT_UNITS = 60
+
+# with the viewport option, this many characters around the window are
+# recognized too, so that shapes crossing its border are complete
+VIEWPORT_MARGIN = 4
+
+# with the processes option, images with fewer characters are recognized
+# in one process, as starting the processes takes longer
+PARALLEL_MIN_SIZE = 20000
+
+# with the level_of_detail option, labels are not drawn when a character
+# cell is smaller than this (in pixels)
+MIN_LABEL_PIXELS = 6
+
 CLASS_LINE = 'line'
 CLASS_STRING = 'str'
 CLASS_RECTANGLE = 'rect'
 CLASS_JOIN = 'join'
 CLASS_FIXED = 'fixed'
+CLASS_OUTSIDE = 'outside'
+
+# the classification table stores small integers instead of the names above
+CLASS_NAMES = [None, CLASS_LINE, CLASS_STRING, CLASS_RECTANGLE, CLASS_JOIN, CLASS_FIXED, CLASS_OUTSIDE]
+CLASS_CODES = dict((name, code) for code, name in enumerate(CLASS_NAMES))
+
+# maximal runs of line characters, used to build the run tables
+HORIZONTAL_RUNS = re.compile(r'-+|=+|_+|~+')
+VERTICAL_RUNS = re.compile(r'\|+')
+NON_SPACE = re.compile(r'[^ ]')
 
 DEFAULT_OPTIONS = dict(
     background='#ffffff',
@@ -45,20 +90,101 @@ DEFAULT_OPTIONS = dict(
     encoding='utf-8',
     widechars='F,W',
     rounded=False,
+    merge_rectangles=False,
+    merge_hatches=False,
+    merge_borders=False,
+    merge_lines=False,
+    boxes=False,
+    fixed_point=False,
+    remove_overlaps=False,
+    spatial_index=False,
+    viewport=None,
+    level_of_detail=0,
+    processes=1,
 )
 
 # - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
 
 
-class AsciiArtImage:
+class PaddingTable(dict):
+    """\
+    Translation table for ``str.translate`` that appends a space to each
+    wide glyph, so that each character of the padded text needs one cell.
+    ``widechars`` is a comma separated list of the ``east_asian_width``
+    categories that are two cells wide. The width of a code point is
+    looked up on its first use only.
+    """
+
+    def __init__(self, widechars):
+        dict.__init__(self)
+        self.wide = set(widechars.split(','))
+        # ASCII text is left as it is, unless these categories are wide
+        self.ascii_narrow = not self.wide & {'Na', 'N'}
+
+    def __missing__(self, code):
+        c = unichr(code)
+        if east_asian_width(c) in self.wide:
+            self[code] = c + ' '
+        else:
+            self[code] = code
+        return self[code]
+
+
+class BoundFunctions(dict):
+    """\
+    The functions of a dispatch table (see ``_dispatch_tables``), bound to
+    ``image`` when they are looked up the first time. Keys without a
+    function map to ``None``.
+    """
+
+    def __init__(self, functions, image):
+        dict.__init__(self)
+        self.functions = functions
+        self.image = image
+
+    def __missing__(self, key):
+        function = self.functions.get(key)
+        if function is not None:
+            function = types.MethodType(function, self.image)
+        self[key] = function
+        return function
+
+
+_padding_tables = {}
+
+
+def padding_table(widechars):
+    """Return the (shared) ``PaddingTable`` for ``widechars``"""
+    try:
+        return _padding_tables[widechars]
+    except KeyError:
+        table = _padding_tables[widechars] = PaddingTable(widechars)
+        return table
+
+
+def pad_line(line, table):
+    """Pad the wide glyphs in ``line`` with a space, see ``PaddingTable``"""
+    if table.ascii_narrow:
+        try:
+            line.encode('ascii')
+        except UnicodeError:
+            pass
+        else:
+            return line
+    return line.translate(table)
+
+
+class AsciiArtImage(object):
     """\
     This class holds a ASCII art figure and has methods to parse it.
     The resulting list of shapes is also stored here.
 
-    The image is parsed in 2 steps:
+    The image is parsed in 4 steps (see ``PHASES``):
 
-    1. horizontal string detection.
-    2. generic shape detection.
+    1. quoted string detection.
+    2. box detection (only with the ``boxes`` option).
+    3. generic shape detection.
+    4. detection of the remaining strings.
 
     Each character that is used in a shape or string is tagged. So that
     further searches don't include it again (e.g. text in a string touching
@@ -75,40 +201,160 @@ class AsciiArtImage:
         self.textual = options.get('textual', False)
         self.textual_strict = options.get('textual_strict', False)
         self.rounded = options.get('rounded', False)
+        self.level_of_detail = options.get('level_of_detail', 0)
+        # a reduced level of detail needs fewer shapes when hatches and
+        # solid fills are drawn per region
+        self.merge_rectangles = options.get('merge_rectangles', False) or bool(self.level_of_detail)
+        self.merge_hatches = options.get('merge_hatches', False) or bool(self.level_of_detail)
+        self.merge_borders = options.get('merge_borders', False)
+        self.merge_lines = options.get('merge_lines', False)
+        self.boxes = options.get('boxes', False)
+        self.fixed_point = options.get('fixed_point', False)
+        # size of one unit of the coordinates of the shapes, in drawing
+        # units. the output visitors multiply the coordinates with it
+        if self.fixed_point:
+            self.unit = float(NOMINAL_SIZE) / FIXED_POINT_UNITS
+        else:
+            self.unit = 1
+        self.remove_overlaps = options.get('remove_overlaps', False)
+        self.spatial_index = options.get('spatial_index', False)
+        self.viewport = options.get('viewport', None)
+        self.processes = options.get('processes', 1)
+        (arrows, fills, self._region_fills, fixed,
+         self._handlers) = self._dispatch_tables()
+        # the functions returned by get_arrow, get_fill and
+        # get_fixed_character are bound to this image once, on first use
+        self._arrows = BoundFunctions(arrows, self)
+        self._fills = BoundFunctions(fills, self)
+        self._fixed = BoundFunctions(fixed, self)
+        self._simpler_fills = self._detail_table()
         # XXX TODO tab expansion
         # detect size of input image, store as list of lines
-        self.image = []
+        lines = []
         max_x = 0
-        y = 0
-        # define character widths map
-        charwidths = {}
-        for key in ['F', 'H', 'W', 'Na', 'A', 'N']:
-            if key in options.get('widechars', 'F,W').split(','):
-                charwidths[key] = 2
-            else:
-                charwidths[key] = 1
-        for line in text.splitlines():
-            # extend length by 1 for each wide glyph
-            line_len = sum(charwidths[east_asian_width(c)] for c in line)
-            max_x = max(max_x, line_len)
-            # pad a space for each wide glyph
-            padded_line = ''.join(c + ' ' * (charwidths[east_asian_width(c)] - 1) for c in line)
-            self.image.append(padded_line)
-            y += 1
-        self.width = max_x
-        self.height = y
-        # make sure it's rectangular (extend short lines to max width)
-        for y, line in enumerate(self.image):
-            if len(line) < max_x:
-                self.image[y] = line + ' ' * (max_x - len(line))
+        # the wide glyphs are padded with a space
+        widths = padding_table(options.get('widechars', 'F,W'))
+        rows = text.splitlines()
+        # the position of the first stored cell, relative to the drawn area
+        self._origin_x = self._origin_y = 0
+        if self.viewport is not None:
+            # only the rows of the window are needed, columns are cut
+            # after the wide glyphs are padded
+            top = max(0, self.viewport[1] - VIEWPORT_MARGIN)
+            rows = rows[top:self.viewport[1] + self.viewport[3] + VIEWPORT_MARGIN]
+            self._origin_y = top - self.viewport[1]
+        for line in rows:
+            padded_line = pad_line(line, widths)
+            max_x = max(max_x, len(padded_line))
+            lines.append(padded_line)
+        if self.viewport is not None:
+            lines, max_x = self._crop(lines)
+        self._options = options
+        self._build_grid(lines, max_x)
         # initialize other data structures
-        self.classification = [[None] * self.width for y in range(self.height)]
         self.shapes = []
         self.nominal_size = NOMINAL_SIZE
+        # counters filled by the post processing steps
+        self.statistics = {}
+        self.index = None
+        # pairs of grid indices of adjacent '+' on the sides of boxes, they
+        # are not joined again (see _plus_joiner)
+        self._box_links = set()
+        # the shapes list and the row of each shape, see update
+        self._shape_rows = None
+
+    def _build_grid(self, lines, max_x):
+        """Store the (padded) lines as grid and build the index tables"""
+        self.width = max_x
+        self.height = len(lines)
+        # the length of each (padded) line, the grid is extended with spaces
+        self._line_lengths = [len(line) for line in lines]
+        # The image is stored as one string, each row is extended to the max
+        # width (so that it's rectangular) and the whole image is surrounded
+        # by a border of spaces. Neighbors of any cell can therefore be
+        # accessed without bounds checks. The classification table is a
+        # parallel array of class codes (see CLASS_NAMES), the border is
+        # marked as outside.
+        self._stride = stride = self.width + 2
+        self._chars = ''.join(
+            [' ' * stride] +
+            [' ' + line.ljust(max_x) + ' ' for line in lines] +
+            [' ' * stride])
+        self._classes = bytearray(len(self._chars))
+        outside = CLASS_CODES[CLASS_OUTSIDE]
+        self._classes[:stride] = bytearray([outside]) * stride
+        self._classes[-stride:] = bytearray([outside]) * stride
+        self._classes[::stride] = bytearray([outside]) * (self.height + 2)
+        self._classes[stride - 1::stride] = bytearray([outside]) * (self.height + 2)
+        self._build_run_tables()
+        self._build_occupancy_index()
 
     def __str__(self):
         """Return the original image"""
-        return '\n'.join([self.image[y] for y in range(self.height)])
+        return '\n'.join([self.row(y) for y in range(self.height)])
+
+    def _crop(self, lines):
+        """\
+        Cut the columns of the viewport, plus a margin, out of the (padded)
+        lines. Return the lines and their maximal length.
+        """
+        x, width = self.viewport[0], self.viewport[2]
+        left = max(0, x - VIEWPORT_MARGIN)
+        lines = [line[left:x + width + VIEWPORT_MARGIN] for line in lines]
+        self._origin_x = left - x
+        return lines, max([len(line) for line in lines] + [0])
+
+    def size(self):
+        """\
+        Width and height of the drawn area in characters. This is the size
+        of the image, respectively of the window with the ``viewport``
+        option.
+        """
+        if self.viewport is not None:
+            return self.viewport[2], self.viewport[3]
+        return self.width, self.height
+
+    def row(self, y):
+        """Get a line of the (padded) image as string"""
+        start = (y + 1) * self._stride + 1
+        return self._chars[start:start + self.width]
+
+    def _build_run_tables(self):
+        """\
+        Find all maximal runs of line characters. Each cell that is part of
+        a run has the number of the run in the ``_hrun_ids`` respectively
+        ``_vrun_ids`` array and the run lists contain the grid index of the
+        first and last cell. This way the end of a line can be looked up
+        instead of walking it character by character.
+        """
+        chars = self._chars
+        stride = self._stride
+        self._hruns = [None]
+        self._hrun_ids = array('i', [0]) * len(chars)
+        for match in HORIZONTAL_RUNS.finditer(chars):
+            start, end = match.span()
+            self._hrun_ids[start:end] = array('i', [len(self._hruns)]) * (end - start)
+            self._hruns.append((start, end - 1))
+        self._vruns = [None]
+        self._vrun_ids = array('i', [0]) * len(chars)
+        for column in range(1, stride - 1):
+            for match in VERTICAL_RUNS.finditer(chars[column::stride]):
+                start = match.start() * stride + column
+                end = (match.end() - 1) * stride + column
+                self._vrun_ids[start:end + 1:stride] = array('i', [len(self._vruns)]) * (match.end() - match.start())
+                self._vruns.append((start, end))
+
+    def _build_occupancy_index(self):
+        """\
+        Store the grid index of all non space characters, in the order the
+        image is scanned (left to right, top to bottom). Quotation
+        characters get an extra index for the quoted text search. The
+        recognition only visits these cells, so blank areas cost nothing.
+        """
+        chars = self._chars
+        self._occupied = array('i', [m.start() for m in NON_SPACE.finditer(chars)])
+        quotes = re.compile('[{}]'.format(re.escape(''.join(self.QUOTATION_CHARACTERS))))
+        self._quotes = array('i', [m.start() for m in quotes.finditer(chars)])
 
     def get(self, x, y):
         """\
@@ -116,47 +362,106 @@ class AsciiArtImage:
         bounds, just returns a space. This simplifies the scanner
         functions.
         """
-        if 0 <= x < self.width and 0 <= y < self.height:
-            return self.image[y][x]
+        if -1 <= x <= self.width and -1 <= y <= self.height:
+            return self._chars[(y + 1) * self._stride + x + 1]
         else:
             return ' '
 
     def tag(self, coordinates, classification):
         """Tag coordinates as used, store classification"""
+        code = CLASS_CODES[classification]
+        classes = self._classes
+        stride = self._stride
         for x, y in coordinates:
-            self.classification[y][x] = classification
+            classes[(y + 1) * stride + x + 1] = code
+
+    def _tag_span(self, x1, y1, x2, y2, classification):
+        """\
+        Tag a horizontal or vertical span of coordinates (including both
+        ends), store classification.
+        """
+        start = (y1 + 1) * self._stride + x1 + 1
+        end = (y2 + 1) * self._stride + x2 + 1
+        step = self._stride if x1 == x2 and y1 != y2 else 1
+        self._classes[start:end + 1:step] = bytearray([CLASS_CODES[classification]]) * ((end - start) // step + 1)
 
     def cls(self, x, y):
         """Get tag at coordinate"""
-        try:
-            return self.classification[y][x]
-        except IndexError:
-            return 'outside'
+        if -1 <= x <= self.width and -1 <= y <= self.height:
+            return CLASS_NAMES[self._classes[(y + 1) * self._stride + x + 1]]
+        else:
+            return CLASS_OUTSIDE
 
-    # Coordinate conversion and shifting
+    # Coordinate conversion and shifting. With the fixed_point option, the
+    # coordinates are integers in FIXED_POINT_UNITS per cell height
     def left(self, x):
-        return x * NOMINAL_SIZE * self.aspect_ratio
+        if self.fixed_point:
+            return int(round((x + self._origin_x) * FIXED_POINT_UNITS * self.aspect_ratio))
+        return (x + self._origin_x) * NOMINAL_SIZE * self.aspect_ratio
 
     def hcenter(self, x):
-        return (x + 0.5) * NOMINAL_SIZE * self.aspect_ratio
+        if self.fixed_point:
+            return int(round((x + self._origin_x + 0.5) * FIXED_POINT_UNITS * self.aspect_ratio))
+        return (x + self._origin_x + 0.5) * NOMINAL_SIZE * self.aspect_ratio
 
     def right(self, x):
-        return (x + 1)*NOMINAL_SIZE * self.aspect_ratio
+        if self.fixed_point:
+            return int(round((x + self._origin_x + 1) * FIXED_POINT_UNITS * self.aspect_ratio))
+        return (x + self._origin_x + 1)*NOMINAL_SIZE * self.aspect_ratio
 
     def top(self, y):
-        return y * NOMINAL_SIZE
+        if self.fixed_point:
+            return int(round((y + self._origin_y) * FIXED_POINT_UNITS))
+        return (y + self._origin_y) * NOMINAL_SIZE
 
     def vcenter(self, y):
-        return (y + 0.5) * NOMINAL_SIZE
+        if self.fixed_point:
+            return int(round((y + self._origin_y + 0.5) * FIXED_POINT_UNITS))
+        return (y + self._origin_y + 0.5) * NOMINAL_SIZE
 
     def bottom(self, y):
-        return (y + 1) * NOMINAL_SIZE
+        if self.fixed_point:
+            return int(round((y + self._origin_y + 1) * FIXED_POINT_UNITS))
+        return (y + self._origin_y + 1) * NOMINAL_SIZE
+
+    # Sizes that are not tied to the cells (arrow heads, radii) are given in
+    # drawing units and converted with these functions
+    def _length(self, length):
+        """Convert a length (e.g. a radius)"""
+        if self.fixed_point:
+            return int(round(length * FIXED_POINT_UNITS / NOMINAL_SIZE))
+        return length
+
+    def _offset(self, vector):
+        """Convert a vector (complex number)"""
+        if self.fixed_point:
+            return complex(round(vector.real / self.unit), round(vector.imag / self.unit))
+        return vector
+
+    def _point(self, position):
+        """Make a ``Point`` from a complex number"""
+        if self.fixed_point:
+            return new(Point, (int(position.real), int(position.imag)))
+        return new(Point, (position.real, position.imag))
 
     def recognize(self):
         """\
         Try to convert ASCII art to vector graphics. The result is stored in
         ``self.shapes``.
+
+        With the ``processes`` option, independent parts of the image are
+        recognized in parallel (see ``_recognize_parts``).
         """
+        self._shape_rows = None
+        if self.processes > 1 and self.viewport is None:
+            self._recognize_parts()
+        else:
+            self._recognize_shapes()
+        if self.spatial_index:
+            self.build_index()
+
+    def _recognize_shapes(self):
+        """Find the shapes in the whole image and run the post processing"""
         # XXX search for symbols
         #~ #search for long strings
         #~ for y in range(self.height):
@@ -167,53 +472,316 @@ class AsciiArtImage:
                         #~ self.shapes.extend(
                             #~ self._follow_horizontal_string(x, y)
                         #~ )
-        # search for quoted texts
-        for y in range(self.height):
-            for x in range(self.width):
-                #if not yet classified, check for a line
-                character = self.image[y][x]
-                if character in self.QUOTATION_CHARACTERS and self.classification[y][x] is None:
-                    self.shapes.extend(
-                        self._follow_horizontal_string(x, y, quoted=True))
-
-        # search for standard shapes
-        for y in range(self.height):
-            for x in range(self.width):
-                # if not yet classified, check for a line
-                character = self.image[y][x]
-                if self.classification[y][x] is None:
-                    if character == '-':
-                        self.shapes.extend(self._follow_horizontal_line(x, y))
-                    elif character == '|':
-                        self.shapes.extend(self._follow_vertical_line(x, y))
-                    elif character == '_':
-                        self.shapes.extend(self._follow_lower_horizontal_line(x, y))
-                    elif character == '~':
-                        self.shapes.extend(self._follow_upper_horizontal_line(x, y))
-                    elif character == '=':
-                        self.shapes.extend(self._follow_horizontal_line(x, y, thick=True))
-                    elif character in '\\/':
-                        self.shapes.extend(self._follow_rounded_edge(x, y))
-                    elif character == '+':
-                        self.shapes.extend(self._plus_joiner(x, y))
-                    elif character in self.FIXED_CHARACTERS:
-                        self.shapes.extend(self.get_fixed_character(character)(x, y))
-                        self.tag([(x, y)], CLASS_FIXED)
-                    elif not self.textual_strict and character in self.FILL_CHARACTERS:
-                        if self.textual:
-                            if self.get(x, y + 1) == character:
-                                self.shapes.extend(self._follow_fill(character, x, y))
-                        else:
-                            if (self.get(x + 1, y) == character or self.get(x, y + 1) == character):
-                                self.shapes.extend(self._follow_fill(character, x, y))
-
-        # search for short strings too
-        for y in range(self.height):
-            for x in range(self.width):
-                character = self.image[y][x]
-                if self.classification[y][x] is None:
-                    if character != ' ':
-                        self.shapes.extend(self._follow_horizontal_string(x, y, accept_anything=True))
+        for phase, shapes in self.recognize_phases():
+            self.shapes.extend(shapes)
+
+        # post processing
+        if self.viewport is not None:
+            self.shapes = self._visible_shapes(self.shapes)
+        if self.level_of_detail and self.level_of_detail < MIN_LABEL_PIXELS:
+            self.shapes = simplify.without_labels(self.shapes)
+        if self.remove_overlaps:
+            self.shapes = simplify.remove_overlaps(self.shapes, self.statistics)
+        if self.merge_rectangles:
+            self.shapes = simplify.merge_rectangles(self.shapes)
+        if self.merge_lines:
+            self.shapes = simplify.merge_lines(self.shapes)
+
+    # The phases of the recognition, in this order: the name and the method
+    # that returns the shapes found in the phase. Each phase tags the
+    # characters it used, so that the following phases skip them.
+
+    PHASES = [
+        ('quoted_strings', '_find_quoted_strings'),
+        ('boxes', '_find_boxes'),
+        ('shapes', '_find_shapes'),
+        ('strings', '_find_strings'),
+    ]
+
+    def recognize_phases(self, phases=None):
+        """\
+        Recognize the image phase by phase (see ``PHASES``). This is a
+        generator that yields a tuple ``(phase, shapes)`` after each phase,
+        so that the caller can use the shapes while the image is
+        recognized, or stop early. ``phases`` is a list of the names of the
+        phases to run, by default all (``boxes`` only with the ``boxes``
+        option). Skipped phases change the result of the later ones, e.g.
+        without ``shapes``, the lines are found as strings. The shapes are
+        not post processed and not stored in ``self.shapes``.
+        """
+        names = [name for name, method in self.PHASES]
+        if phases is None:
+            phases = [name for name in names if name != 'boxes' or self.boxes]
+        for name in phases:
+            if name not in names:
+                raise ValueError('no such phase: {!r}'.format(name))
+        for name, method in self.PHASES:
+            if name in phases:
+                yield name, getattr(self, method)()
+
+    def _find_quoted_strings(self):
+        """Find the texts in quotes"""
+        classes = self._classes
+        stride = self._stride
+        shapes = []
+        for i in self._quotes:
+            # if not yet classified, check for a string
+            if not classes[i]:
+                y, x = divmod(i, stride)
+                shapes.extend(self._follow_horizontal_string(x - 1, y - 1, quoted=True))
+        return shapes
+
+    def _find_shapes(self):
+        """Find lines, fills etc. (the characters in ``SHAPE_TYPES`` etc.)"""
+        chars = self._chars
+        classes = self._classes
+        stride = self._stride
+        shapes = []
+        for i in self._occupied:
+            # if not yet classified, check for a shape
+            if not classes[i]:
+                handler = self._handlers.get(chars[i])
+                if handler is not None:
+                    y, x = divmod(i, stride)
+                    shapes.extend(handler(self, x - 1, y - 1))
+        return shapes
+
+    def _find_strings(self):
+        """Find the texts in all remaining characters"""
+        classes = self._classes
+        stride = self._stride
+        shapes = []
+        for i in self._occupied:
+            if not classes[i]:
+                y, x = divmod(i, stride)
+                shapes.extend(self._follow_horizontal_string(x - 1, y - 1, accept_anything=True))
+        return shapes
+
+    def labels(self):
+        """\
+        Find the texts in the image, without recognizing the other shapes.
+        This is used instead of ``recognize``, e.g. to index the texts of
+        many images. The characters of the other shapes are only tagged, so
+        that they are not taken for text (see ``CLAIM_TYPES``). Returns a
+        list of tuples ``(x, y, text)`` with the cell of the first
+        character, in reading order. The texts are the same as the ones of
+        the ``Label`` shapes of ``recognize``.
+        """
+        if self.viewport is not None:
+            raise ValueError('labels is not supported with the viewport option')
+        chars = self._chars
+        classes = self._classes
+        stride = self._stride
+        claims = dict(
+            (getattr(AsciiArtImage, handler), getattr(self, claim))
+            for handler, claim in self.CLAIM_TYPES)
+        shapes = self._find_quoted_strings()
+        # tag the characters of the other shapes
+        for i in self._occupied:
+            if not classes[i]:
+                handler = self._handlers.get(chars[i])
+                if handler is not None:
+                    y, x = divmod(i, stride)
+                    claim = claims.get(handler)
+                    if claim is not None:
+                        claim(x - 1, y - 1)
+                    else:
+                        handler(self, x - 1, y - 1)
+        shapes.extend(self._find_strings())
+        # the labels are placed at the bottom left corner of the first cell
+        width, height = self.character_size()
+        labels = [
+            (int(round(label.position.x / width)) - self._origin_x,
+             int(round(label.position.y / height)) - 1 - self._origin_y,
+             label.text)
+            for label in shapes]
+        labels.sort(key=lambda label: (label[1], label[0]))
+        return labels
+
+    def _recognize_parts(self):
+        """\
+        Split the image into parts that are not connected (see
+        ``_components``), recognize them in a pool of ``processes``
+        processes and combine the results. Each part is recognized as an
+        image of the full width, with the characters of the other parts
+        removed, so that the shapes are the same as for the whole image.
+        The shapes are transferred as ``ShapeTable``.
+        """
+        rows = [self.row(y) for y in range(self.height)]
+        if len(self._occupied) < PARALLEL_MIN_SIZE:
+            parts = []
+        else:
+            parts = _partition(_components(rows), self.processes * 4)
+        if len(parts) < 2:
+            self._recognize_shapes()
+            return
+        options = dict(
+            (key, value) for key, value in self._options.items() if key != 'file_like')
+        options.update(widechars='', spatial_index=False, processes=1)
+        tasks = []
+        for segments in parts:
+            top = segments[0][0]
+            bottom = max(y for y, start, end in segments) + 1
+            lines = [[] for y in range(top, bottom)]
+            for y, start, end in segments:
+                lines[y - top].append((start, end))
+            text = '\n'.join(_only_segments(rows[top + n], line) for n, line in enumerate(lines))
+            tasks.append((self.__class__, text, top, self.width, options))
+        pool = multiprocessing.Pool(self.processes)
+        try:
+            results = pool.map(_recognize_part, tasks)
+        finally:
+            pool.close()
+            pool.join()
+        convert = int if self.fixed_point else None
+        stride = self._stride
+        for segments, (table, statistics, classes) in zip(parts, results):
+            self.shapes.extend(table.to_shapes(convert))
+            for key, value in statistics.items():
+                self.statistics[key] = self.statistics.get(key, 0) + value
+            # copy the classification of the rows of the part. the other
+            # parts are empty there, only the tagged cells are copied (this
+            # includes spaces, e.g. behind an unterminated quote)
+            offset = segments[0][0] * stride
+            for match in TAGGED.finditer(classes, stride, len(classes) - stride):
+                self._classes[offset + match.start():offset + match.end()] = match.group()
+
+    def _visible_shapes(self, shapes):
+        """\
+        Drop the shapes that are completely outside of the viewport, i.e.
+        in the margin around it.
+        """
+        character_width = NOMINAL_SIZE * self.aspect_ratio
+        width, height = self.size()
+        x2, y2 = width * character_width, height * NOMINAL_SIZE
+        result = []
+        for shape in shapes:
+            box = shape.bounding_box(character_width, NOMINAL_SIZE)
+            if box is not None and box[0] <= x2 and box[2] >= 0 and box[1] <= y2 and box[3] >= 0:
+                result.append(shape)
+        return result
+
+    def update(self, start, end, lines):
+        """\
+        Replace the rows ``start`` to ``end`` (excluding ``end``, like a
+        slice) of a recognized image with the given text lines and
+        recognize the changed part again.
+
+        Only the bands of rows that are connected to the changed rows are
+        recognized (see ``recognize_lines``), the shapes of the other
+        rows are kept, respectively moved when the number of rows
+        changes. Returns a tuple ``(shapes, added, removed)`` with the
+        new list of shapes and the shapes that are in the new but not in
+        the old list, respectively the other way round. The order of the
+        shapes may differ from a new recognition of the whole text.
+        """
+        if self.viewport is not None:
+            raise ValueError('update is not supported with the viewport option')
+        widths = padding_table(self._options.get('widechars', 'F,W'))
+        old_rows = [self.row(y)[:length] for y, length in enumerate(self._line_lengths)]
+        rows = old_rows[:start] + [pad_line(line, widths) for line in lines] + old_rows[end:]
+        delta = len(rows) - len(old_rows)
+        # the changed rows, and their neighbors, are extended to the bands
+        # they are part of, in the old and in the new image. rows above
+        # start are the same in both, rows from end on are moved by delta
+        old_top, old_bottom = _band_rows(old_rows, max(0, start - 1), min(len(old_rows), end + 1))
+        top, bottom = _band_rows(rows, max(0, start - 1), min(len(rows), end + delta + 1))
+        top = min(top, old_top)
+        bottom = max(bottom, old_bottom + delta)
+        old_bottom = bottom - delta
+        # update the grid, the classification outside of the band is kept
+        old_classes = [self._classes[(y + 1) * self._stride + 1:(y + 2) * self._stride - 1]
+                       for y in range(self.height)]
+        self._build_grid(rows, max([len(row) for row in rows] + [0]))
+        # recognize the band, as part of an image with the same width so
+        # that the labels are padded the same way
+        options = dict(self._options, widechars='', viewport=None, spatial_index=False)
+        band = AsciiArtImage('\n'.join(row.ljust(self.width) for row in rows[top:bottom]), options)
+        band._origin_y = top
+        band.recognize()
+        band_classes = [band._classes[(y + 1) * band._stride + 1:(y + 2) * band._stride - 1]
+                        for y in range(band.height)]
+        classes = old_classes[:top] + band_classes + old_classes[old_bottom:]
+        for y, row_classes in enumerate(classes):
+            row_classes = row_classes[:self.width]
+            offset = (y + 1) * self._stride + 1
+            self._classes[offset:offset + len(row_classes)] = row_classes
+        # sort the old shapes into the ones above, in and below the band.
+        # the row of each shape is remembered for the next update
+        if self._shape_rows is None or self._shape_rows[0] is not self.shapes:
+            shape_rows = [self._shape_row(shape, old_rows) for shape in self.shapes]
+        else:
+            shape_rows = self._shape_rows[1]
+        character_height = self.character_size()[1]
+        kept = []
+        kept_rows = []
+        removed = []
+        moved = []
+        moved_rows = []
+        for shape, row in zip(self.shapes, shape_rows):
+            if top <= row < old_bottom:
+                removed.append(shape)
+            elif row >= old_bottom and delta:
+                removed.append(shape)
+                moved.append(shape.moved(0, delta * character_height))
+                moved_rows.append(row + delta)
+            else:
+                kept.append(shape)
+                kept_rows.append(row)
+        added = band.shapes + moved
+        self.shapes = kept + added
+        self._shape_rows = (self.shapes, kept_rows + [
+            self._shape_row(shape, rows) for shape in band.shapes] + moved_rows)
+        if self.spatial_index:
+            self.build_index()
+        return self.shapes, added, removed
+
+    def _shape_row(self, shape, rows):
+        """\
+        Helper for update: return the row a shape belongs to, by the middle
+        of its bounding box. Horizontal lines on the border of two rows
+        belong to the row that has a character next to them.
+        """
+        character_width, character_height = self.character_size()
+        box = shape.bounding_box(character_width, character_height)
+        if box is None:
+            return -1
+        x1, y1, x2, y2 = box
+        row = int((y1 + y2) / 2.0 // character_height)
+        if y1 == y2 == row * character_height and row > 0:
+            if row < len(rows):
+                for x in _occupied_columns(rows[row]):
+                    if x1 < (x + 1) * character_width and x2 > x * character_width:
+                        return row
+            return row - 1
+        return row
+
+    def character_size(self):
+        """Width and height of a character cell in the units of ``shapes``"""
+        if self.fixed_point:
+            return (FIXED_POINT_UNITS * self.aspect_ratio, FIXED_POINT_UNITS)
+        return (NOMINAL_SIZE * self.aspect_ratio, NOMINAL_SIZE)
+
+    def build_index(self, cell_size=8):
+        """\
+        Create a ``SpatialIndex`` (see ``spatial.py``) of ``shapes`` and
+        store it as ``index``. The grid cells are ``cell_size`` characters
+        wide and high.
+        """
+        width, height = self.character_size()
+        self.index = SpatialIndex(self.shapes, cell_size * width, cell_size * height, width, height)
+        return self.index
+
+    def drawing_shapes(self):
+        """\
+        Return the shapes with coordinates in drawing units. This is
+        ``shapes``, except with the ``fixed_point`` option, where a copy
+        with the coordinates multiplied by ``unit`` is made. The output
+        visitors do not need it, they scale the coordinates when drawing.
+        """
+        if self.fixed_point:
+            return [shape.scaled(self.unit, self.unit) for shape in self.shapes]
+        return self.shapes
 
     # - - - - - - - - - helper function for some shapes - - - - - - - - -
     # Arrow drawing functions return the (new) starting point of the line and a
@@ -233,24 +801,26 @@ class AsciiArtImage:
         direction_vector = p1 - p2
         direction_vector /= abs(direction_vector)
         return p1, [
-            Line(p1, p1-direction_vector * 1.5 + direction_vector * 0.5j),
-            Line(p1, p1-direction_vector * 1.5 + direction_vector * -0.5j)
+            Line(self._point(p1), self._point(p1 + self._offset(-direction_vector * 1.5 + direction_vector * 0.5j))),
+            Line(self._point(p1), self._point(p1 + self._offset(-direction_vector * 1.5 + direction_vector * -0.5j)))
         ]
 
     def _reversed_arrow(self, p1, p2):
         """--<"""
         direction_vector = p1 - p2
         direction_vector /= abs(direction_vector)
-        return p1-direction_vector * 2, [
-            Line(p1-direction_vector * 2.0, p1+direction_vector * (-0.5 + 0.5j)),
-            Line(p1-direction_vector * 2.0, p1+direction_vector * (-0.5 - 0.5j))
+        start = p1 + self._offset(-direction_vector * 2.0)
+        return start, [
+            Line(self._point(start), self._point(p1 + self._offset(direction_vector * (-0.5 + 0.5j)))),
+            Line(self._point(start), self._point(p1 + self._offset(direction_vector * (-0.5 - 0.5j))))
         ]
 
     def _circle_head(self, p1, p2, radius=0.5):
         """--o"""
         direction_vector = p1 - p2
         direction_vector /= abs(direction_vector)
-        return p1-direction_vector, [Circle(p1 - direction_vector, radius)]
+        center = p1 + self._offset(-direction_vector)
+        return center, [Circle(self._point(center), self._length(radius))]
 
     def _large_circle_head(self, p1, p2):
         """--O"""
@@ -264,15 +834,13 @@ class AsciiArtImage:
             #~ Rectangle(p1-direction_vector-direction_vector*(0.707+0.707j),
                       #~ p1-direction_vector+direction_vector*(0.707+0.707j))
         #~ ]
-        return p1-direction_vector * 1.707, [
-            Line(p1 - direction_vector - direction_vector * (0.707 + 0.707j),
-                 p1 - direction_vector - direction_vector * (0.707 - 0.707j)),
-            Line(p1 - direction_vector + direction_vector * (0.707 + 0.707j),
-                 p1 - direction_vector + direction_vector * (0.707 - 0.707j)),
-            Line(p1 - direction_vector - direction_vector * (0.707 + 0.707j),
-                 p1 - direction_vector + direction_vector * (0.707 - 0.707j)),
-            Line(p1 - direction_vector - direction_vector * (0.707 - 0.707j),
-                 p1 - direction_vector + direction_vector * (0.707 + 0.707j)),
+        def corner(vector):
+            return self._point(p1 + self._offset(-direction_vector + direction_vector * vector))
+        return p1 + self._offset(-direction_vector * 1.707), [
+            Line(corner(-0.707 - 0.707j), corner(-0.707 + 0.707j)),
+            Line(corner(0.707 + 0.707j), corner(0.707 - 0.707j)),
+            Line(corner(-0.707 - 0.707j), corner(0.707 - 0.707j)),
+            Line(corner(-0.707 + 0.707j), corner(0.707 + 0.707j)),
         ]
 
     # the same character can mean a different thing, depending from where the
@@ -309,9 +877,7 @@ class AsciiArtImage:
 
     def get_arrow(self, character, dx, dy):
         """Return arrow drawing function or None."""
-        for head, ddx, ddy, function_name in self.ARROW_TYPES:
-            if character == head and dx == ddx and dy == ddy:
-                return getattr(self, function_name)
+        return self._arrows[character, dx, dy]
 
     # - - - - - - - - - fills - - - - - - - - -
     # Fill functions return a list of shapes. Each one if covering one cell
@@ -353,20 +919,26 @@ class AsciiArtImage:
         result = []
         if left:
             for i in range(n):
-                result.append(Line(
-                    Point(self.left(x), self.top(y + d * i)),
-                    Point(self.right(x - d * i), self.bottom(y))
-                ))
+                result.append(new(Line, (
+                    new(Point, (self.left(x), self.top(y + d * i))),
+                    new(Point, (self.right(x - d * i), self.bottom(y))),
+                    False)))
                 if n:
-                    result.append(Line(
-                        Point(self.right(x - d * i), self.top(y)),
-                        Point(self.right(x), self.top(y + d * i))
-                    ))
+                    result.append(new(Line, (
+                        new(Point, (self.right(x - d * i), self.top(y))),
+                        new(Point, (self.right(x), self.top(y + d * i))),
+                        False)))
         else:
             for i in range(n):
-                result.append(Line(Point(self.left(x), self.top(y + d * i)), Point(self.left(x + d * i), self.top(y))))
+                result.append(new(Line, (
+                    new(Point, (self.left(x), self.top(y + d * i))),
+                    new(Point, (self.left(x + d * i), self.top(y))),
+                    False)))
                 if n:
-                    result.append(Line(Point(self.left(x + d * i), self.bottom(y)), Point(self.right(x), self.top(y + d * i))))
+                    result.append(new(Line, (
+                        new(Point, (self.left(x + d * i), self.bottom(y))),
+                        new(Point, (self.right(x), self.top(y + d * i))),
+                        False)))
         return result
 
     def _hatch_v(self, x, y):
@@ -407,19 +979,19 @@ class AsciiArtImage:
         if vertical:
             for i in range(n):
                 i = i + offset
-                result.append(Line(
-                    Point(self.left(x + d * i), self.top(y)),
-                    Point(self.left(x + d * i), self.bottom(y))
-                ))
+                result.append(new(Line, (
+                    new(Point, (self.left(x + d * i), self.top(y))),
+                    new(Point, (self.left(x + d * i), self.bottom(y))),
+                    False)))
                 #~ if n:
                     #~ result.append(Line(Point(self.right(x-d*i), self.top(y)), Point(self.right(x), self.top(y+d*i))))
         else:
             for i in range(n):
                 i = i + offset
-                result.append(Line(
-                    Point(self.left(x), self.top(y + d * i)),
-                    Point(self.right(x), self.top(y + d * i))
-                ))
+                result.append(new(Line, (
+                    new(Point, (self.left(x), self.top(y + d * i))),
+                    new(Point, (self.right(x), self.top(y + d * i))),
+                    False)))
                 #~ if n:
                     #~ result.append(Line(Point(self.left(x+d*i), self.bottom(y)), Point(self.right(x), self.top(y+d*i))))
         return result
@@ -438,10 +1010,10 @@ class AsciiArtImage:
 
     def _fill_foreground(self, x, y):
         return [
-            Rectangle(
-                Point(self.left(x), self.top(y)),
-                Point(self.right(x), self.bottom(y))
-            )
+            new(Rectangle, (
+                new(Point, (self.left(x), self.top(y))),
+                new(Point, (self.right(x), self.bottom(y))),
+                True, False, 0, 0))
         ]
 
     def _fill_background(self, x, y):
@@ -449,17 +1021,17 @@ class AsciiArtImage:
 
     def _fill_small_circle(self, x, y):
         return [
-            Circle(Point(self.left(x + 0.5), self.top(y + 0.5)), 0.2)
+            Circle(Point(self.left(x + 0.5), self.top(y + 0.5)), self._length(0.2))
         ]
 
     def _fill_medium_circle(self, x, y):
         return [
-            Circle(Point(self.left(x + 0.5), self.top(y + 0.5)), 0.4)
+            Circle(Point(self.left(x + 0.5), self.top(y + 0.5)), self._length(0.4))
         ]
 
     def _fill_large_circle(self, x, y):
         return [
-            Circle(Point(self.left(x + 0.5), self.top(y + 0.5)), 0.9)
+            Circle(Point(self.left(x + 0.5), self.top(y + 0.5)), self._length(0.9))
         ]
 
     def _fill_qmark(self, x, y):
@@ -505,12 +1077,237 @@ class AsciiArtImage:
 
     FILL_CHARACTERS = ''.join([t+t.lower() for (t, f) in FILL_TYPES])
 
+    # - - - - - - - - - region fills - - - - - - - - -
+    # The hatch patterns above consist of lines that continue from cell to
+    # cell. With the ``merge_hatches`` option, they are drawn for the whole
+    # region at once, so that each stroke is one long line instead of many
+    # short pieces. These functions get the spans of the region (see
+    # ``_fill_spans``) and return a list of shapes.
+
+    def _region_hatch_left(self, spans):
+        return self._n_region_hatch_diagonal(spans, 1, True)
+
+    def _region_hatch_right(self, spans):
+        return self._n_region_hatch_diagonal(spans, 1, False)
+
+    def _region_cross_hatch(self, spans):
+        return self._n_region_hatch_diagonal(spans, 1, True) + \
+               self._n_region_hatch_diagonal(spans, 1, False)
+
+    def _region_double_hatch_left(self, spans):
+        return self._n_region_hatch_diagonal(spans, 2, True)
+
+    def _region_double_hatch_right(self, spans):
+        return self._n_region_hatch_diagonal(spans, 2, False)
+
+    def _region_double_cross_hatch(self, spans):
+        return self._n_region_hatch_diagonal(spans, 2, True) + \
+               self._n_region_hatch_diagonal(spans, 2, False)
+
+    def _region_triple_hatch_left(self, spans):
+        return self._n_region_hatch_diagonal(spans, 3, True)
+
+    def _region_triple_hatch_right(self, spans):
+        return self._n_region_hatch_diagonal(spans, 3, False)
+
+    def _region_triple_cross_hatch(self, spans):
+        return self._n_region_hatch_diagonal(spans, 3, True) + \
+               self._n_region_hatch_diagonal(spans, 3, False)
+
+    def _n_region_hatch_diagonal(self, spans, n, left=False):
+        """\
+        Hatch pattern generator function. The lines of the pattern are
+        ``X - Y = k / n`` (left) respectively ``X + Y = k / n`` in cell
+        coordinates. The pieces of each line inside the cells of the region
+        are collected (as vertical ranges in 1/n cell units) and joined.
+        """
+        pieces = {}
+        for x, y in self._span_cells(spans):
+            if left:
+                base = n * (x - y)
+            else:
+                base = n * (x + y + 1)
+            for k in range(base - n + 1, base + n):
+                if left:
+                    y1 = max(n * y, n * x - k)
+                    y2 = min(n * y + n, n * x + n - k)
+                else:
+                    y1 = max(n * y, k - n * x - n)
+                    y2 = min(n * y + n, k - n * x)
+                if y1 < y2:
+                    pieces.setdefault(k, []).append((y1, y2))
+        d = 1 / float(n)
+        result = []
+        for k in sorted(pieces):
+            for y1, y2 in self._join_ranges(pieces[k]):
+                if left:
+                    x1, x2 = y1 + k, y2 + k
+                else:
+                    x1, x2 = k - y1, k - y2
+                result.append(Line(
+                    Point(self.left(x1 * d), self.top(y1 * d)),
+                    Point(self.left(x2 * d), self.top(y2 * d))
+                ))
+        return result
+
+    def _region_hatch_v(self, spans):
+        return self._n_region_hatch_straight(spans, 1, True)
+
+    def _region_hatch_h(self, spans):
+        return self._n_region_hatch_straight(spans, 1, False)
+
+    def _region_hv_hatch(self, spans):
+        return self._n_region_hatch_straight(spans, 1, True) + \
+               self._n_region_hatch_straight(spans, 1, False)
+
+    def _region_double_hatch_v(self, spans):
+        return self._n_region_hatch_straight(spans, 2, True)
+
+    def _region_double_hatch_h(self, spans):
+        return self._n_region_hatch_straight(spans, 2, False)
+
+    def _region_double_hv_hatch(self, spans):
+        return self._n_region_hatch_straight(spans, 2, True) + \
+               self._n_region_hatch_straight(spans, 2, False)
+
+    def _region_triple_hatch_v(self, spans):
+        return self._n_region_hatch_straight(spans, 3, True)
+
+    def _region_triple_hatch_h(self, spans):
+        return self._n_region_hatch_straight(spans, 3, False)
+
+    def _region_triple_hv_hatch(self, spans):
+        return self._n_region_hatch_straight(spans, 3, True) + \
+               self._n_region_hatch_straight(spans, 3, False)
+
+    def _n_region_hatch_straight(self, spans, n, vertical=False):
+        """\
+        Hatch pattern generator function. Horizontal lines go through each
+        span, vertical lines through each run of cells in a column.
+        """
+        d = 1 / float(n)
+        offset = 1.0 / (n + 1)
+        result = []
+        if vertical:
+            columns = {}
+            for x, y in self._span_cells(spans):
+                columns.setdefault(x, []).append((y, y + 1))
+            for x in sorted(columns):
+                for y1, y2 in self._join_ranges(columns[x]):
+                    for i in range(n):
+                        i = i + offset
+                        result.append(Line(
+                            Point(self.left(x + d * i), self.top(y1)),
+                            Point(self.left(x + d * i), self.top(y2))
+                        ))
+        else:
+            stride = self._stride
+            for start, end in spans:
+                y = start // stride - 1
+                x1 = start - (y + 1) * stride - 1
+                x2 = end - (y + 1) * stride - 1
+                for i in range(n):
+                    i = i + offset
+                    result.append(Line(
+                        Point(self.left(x1), self.top(y + d * i)),
+                        Point(self.right(x2), self.top(y + d * i))
+                    ))
+        return result
+
+    def _span_cells(self, spans):
+        """Iterate over the coordinates of all cells in a list of spans"""
+        stride = self._stride
+        for start, end in spans:
+            y = start // stride - 1
+            for x in range(start - (y + 1) * stride - 1, end - (y + 1) * stride):
+                yield x, y
+
+    @staticmethod
+    def _join_ranges(ranges):
+        """Sort (start, end) tuples and join the ones that touch each other"""
+        result = []
+        for start, end in sorted(ranges):
+            if result and result[-1][1] == start:
+                result[-1] = (result[-1][0], end)
+            else:
+                result.append((start, end))
+        return result
+
+    REGION_FILL_TYPES = [
+        ('A', '_region_hatch_left'),
+        ('B', '_region_hatch_right'),
+        ('C', '_region_cross_hatch'),
+        ('D', '_region_double_hatch_left'),
+        ('E', '_region_double_hatch_right'),
+        ('F', '_region_double_cross_hatch'),
+        ('G', '_region_triple_hatch_left'),
+        ('H', '_region_triple_hatch_right'),
+        ('I', '_region_triple_cross_hatch'),
+        ('J', '_region_hatch_v'),
+        ('K', '_region_hatch_h'),
+        ('L', '_region_hv_hatch'),
+        ('M', '_region_double_hatch_v'),
+        ('N', '_region_double_hatch_h'),
+        ('O', '_region_double_hv_hatch'),
+        ('P', '_region_triple_hatch_v'),
+        ('Q', '_region_triple_hatch_h'),
+        ('R', '_region_triple_hv_hatch'),
+    ]
+
+    # With the ``level_of_detail`` option, fill patterns are replaced by a
+    # simpler one when a character cell is smaller than the given number of
+    # pixels: hatches that would be denser than a line every 4 pixels use
+    # fewer lines, down to a solid fill. Dots that would be smaller than 2
+    # pixels are not drawn.
+    DETAIL_TYPES = [
+        ('A', 4, 'X'),
+        ('B', 4, 'X'),
+        ('C', 4, 'X'),
+        ('D', 8, 'A'),
+        ('E', 8, 'B'),
+        ('F', 8, 'C'),
+        ('G', 12, 'D'),
+        ('H', 12, 'E'),
+        ('I', 12, 'F'),
+        ('J', 4, 'X'),
+        ('K', 4, 'X'),
+        ('L', 4, 'X'),
+        ('M', 8, 'J'),
+        ('N', 8, 'K'),
+        ('O', 8, 'L'),
+        ('P', 12, 'M'),
+        ('Q', 12, 'N'),
+        ('R', 12, 'O'),
+        ('S', MIN_LABEL_PIXELS, 'Z'),
+        ('T', 6, 'X'),
+        ('U', 10, 'Z'),
+        ('V', 5, 'Z'),
+        ('Y', 8, 'X'),
+    ]
+
+    def _detail_table(self):
+        """\
+        Return a dictionary mapping fill characters to the one that is drawn
+        instead at the ``level_of_detail`` of the image.
+        """
+        if not self.level_of_detail:
+            return {}
+        replacements = dict((head, (pixels, simpler)) for head, pixels, simpler in self.DETAIL_TYPES)
+        result = {}
+        for head in replacements:
+            simpler = head
+            while simpler in replacements and self.level_of_detail < replacements[simpler][0]:
+                simpler = replacements[simpler][1]
+            if simpler != head:
+                result[head] = simpler
+        return result
+
     def get_fill(self, character):
         """Return fill function based on character."""
-        for head, function_name in self.FILL_TYPES:
-            if character == head:
-                return getattr(self, function_name)
-        raise ValueError('no such fill type: {!r}'.format(character))
+        function = self._fills[character]
+        if function is None:
+            raise ValueError('no such fill type: {!r}'.format(character))
+        return function
 
     # - - - - - - - - - fixed characters and their shapes - - - - - - - - -
 
@@ -540,7 +1337,7 @@ class AsciiArtImage:
 
     def _circle(self, x, y):
         return [
-            Circle(Point(self.hcenter(x), self.vcenter(y)), NOMINAL_SIZE / 2.0)
+            Circle(Point(self.hcenter(x), self.vcenter(y)), self._length(NOMINAL_SIZE / 2.0))
         ]
 
     FIXED_TYPES = [
@@ -553,10 +1350,143 @@ class AsciiArtImage:
 
     def get_fixed_character(self, character):
         """Return fixed character function."""
-        for head, function_name in self.FIXED_TYPES:
-            if character == head:
-                return getattr(self, function_name)
-        raise ValueError('no such character: {!r}'.format(character))
+        function = self._fixed[character]
+        if function is None:
+            raise ValueError('no such character: {!r}'.format(character))
+        return function
+
+    # - - - - - - - - - character dispatch - - - - - - - - -
+    # This table maps characters that start a shape to the function that
+    # follows the shape. Fill and fixed characters are added automatically.
+    # The functions are called with the coordinates of the character and
+    # return a list of shapes.
+
+    SHAPE_TYPES = [
+        ('-', '_follow_horizontal_line'),
+        ('|', '_follow_vertical_line'),
+        ('_', '_follow_lower_horizontal_line'),
+        ('~', '_follow_upper_horizontal_line'),
+        ('=', '_follow_thick_horizontal_line'),
+        ('\\', '_follow_rounded_edge'),
+        ('/', '_follow_rounded_edge'),
+        ('+', '_plus_joiner'),
+    ]
+
+    # Finding the labels (see ``labels``) does not need the other shapes,
+    # only the characters they use. These methods tag the characters of a
+    # shape without creating it. Shapes without an entry (and overridden
+    # methods) are followed as usual and the result is dropped.
+
+    CLAIM_TYPES = [
+        ('_follow_horizontal_line', '_claim_line'),
+        ('_follow_vertical_line', '_claim_line'),
+        ('_follow_lower_horizontal_line', '_claim_line'),
+        ('_follow_upper_horizontal_line', '_claim_line'),
+        ('_follow_thick_horizontal_line', '_claim_line'),
+        ('_follow_rounded_edge', '_claim_rounded_edge'),
+        ('_plus_joiner', '_claim_join'),
+        ('_start_fill', '_claim_fill'),
+        ('_fixed_character', '_claim_fixed_character'),
+    ]
+
+    @classmethod
+    def _dispatch_tables(cls):
+        """\
+        Return the lookup tables for arrows, fills, fixed characters and
+        shapes, compiled from the ``*_TYPES`` lists. This is done once per
+        class, the tables map the character (and direction for arrows)
+        directly to the function.
+        """
+        tables = cls.__dict__.get('_compiled_tables')
+        if tables is None:
+            def resolve(function):
+                if isinstance(function, basestring):
+                    return getattr(cls, function)
+                return function
+            # when a key is listed more than once, the first entry wins
+            arrows = {}
+            for head, dx, dy, function in reversed(cls.ARROW_TYPES):
+                arrows[head, dx, dy] = resolve(function)
+            fills = {}
+            for head, function in reversed(cls.FILL_TYPES):
+                fills[head] = resolve(function)
+            region_fills = {}
+            for head, function in reversed(cls.REGION_FILL_TYPES):
+                region_fills[head] = resolve(function)
+            fixed = {}
+            for head, function in reversed(cls.FIXED_TYPES):
+                fixed[head] = resolve(function)
+            handlers = {}
+            for character in cls.FILL_CHARACTERS:
+                handlers[character] = cls._start_fill
+            for character in cls.FIXED_CHARACTERS:
+                handlers[character] = cls._fixed_character
+            for head, function in reversed(cls.SHAPE_TYPES):
+                handlers[head] = resolve(function)
+            tables = (arrows, fills, region_fills, fixed, handlers)
+            cls._compiled_tables = tables
+        return tables
+
+    @classmethod
+    def _invalidate_tables(cls):
+        """Forget compiled lookup tables of this class and all subclasses"""
+        cls._compiled_tables = None
+        for subclass in cls.__subclasses__():
+            subclass._invalidate_tables()
+
+    @classmethod
+    def register_arrow(cls, character, dx, dy, function):
+        """\
+        Add or replace an arrow head for lines coming from the direction
+        ``dx``, ``dy``. ``function`` is a method name or a callable
+        ``function(image, p1, p2)`` that returns the new starting point
+        and a list of shapes (see the ``_*_arrow`` methods).
+        """
+        cls.ARROW_TYPES = [entry for entry in cls.ARROW_TYPES if entry[:3] != (character, dx, dy)]
+        cls.ARROW_TYPES.append((character, dx, dy, function))
+        cls.ARROW_HEADS = sorted(set(head for head, dx, dy, function in cls.ARROW_TYPES))
+        cls._invalidate_tables()
+
+    @classmethod
+    def register_fill(cls, character, function):
+        """\
+        Add or replace a fill pattern. ``character`` is the upper case fill
+        character, the lower case one is registered too (without border).
+        ``function`` is a method name or a callable ``function(image, x, y)``
+        that returns a list of shapes covering one cell.
+        """
+        character = character.upper()
+        cls.FILL_TYPES = [entry for entry in cls.FILL_TYPES if entry[0] != character]
+        cls.FILL_TYPES.append((character, function))
+        cls.FILL_CHARACTERS = ''.join([t + t.lower() for (t, f) in cls.FILL_TYPES])
+        # the pattern drawn for the whole region would no longer match
+        cls.REGION_FILL_TYPES = [entry for entry in cls.REGION_FILL_TYPES if entry[0] != character]
+        cls.DETAIL_TYPES = [entry for entry in cls.DETAIL_TYPES if entry[0] != character]
+        cls._invalidate_tables()
+
+    @classmethod
+    def register_fixed_character(cls, character, function):
+        """\
+        Add or replace a character that is always drawn the same way.
+        ``function`` is a method name or a callable ``function(image, x, y)``
+        that returns a list of shapes.
+        """
+        cls.FIXED_TYPES = [entry for entry in cls.FIXED_TYPES if entry[0] != character]
+        cls.FIXED_TYPES.append((character, function))
+        cls.FIXED_CHARACTERS = ''.join([t for (t, f) in cls.FIXED_TYPES])
+        cls._invalidate_tables()
+
+    @classmethod
+    def register_shape(cls, character, function):
+        """\
+        Add or replace the function that follows a shape starting with
+        ``character``. ``function`` is a method name or a callable
+        ``function(image, x, y)`` that returns a list of shapes and tags the
+        characters it used (see ``tag``).
+        """
+        cls.SHAPE_TYPES = [entry for entry in cls.SHAPE_TYPES if entry[0] != character]
+        cls.SHAPE_TYPES.append((character, function))
+        cls._invalidate_tables()
 
     # - - - - - - - - - helper function for shape recognition - - - - - - - - -
 
@@ -573,7 +1503,7 @@ class AsciiArtImage:
         if self.get(x, end_y + 1) == '+':
             end_y_fix = 0.5
         # tag characters as used (not the arrow heads)
-        self.tag([(x, y) for y in range(start_y, end_y + 1)], CLASS_LINE)
+        self._tag_span(x, start_y, x, end_y, CLASS_LINE)
         # return the new shape object with arrows etc.
         p1 = complex(self.hcenter(x), self.top(start_y + start_y_fix))
         p2 = complex(self.hcenter(x), self.bottom(end_y + end_y_fix))
@@ -584,7 +1514,7 @@ class AsciiArtImage:
         if line_end_style:
             p2, arrow_shapes = line_end_style(p2, p1)
             shapes.extend(arrow_shapes)
-        shapes.append(Line(p1, p2))
+        shapes.append(new(Line, (self._point(p1), self._point(p2), False)))
         return group(shapes)
 
     def _follow_horizontal_line(self, x, y, thick=False):
@@ -602,7 +1532,7 @@ class AsciiArtImage:
             start_x_fix = -0.5
         if self.get(end_x + 1, y) == '+':
             end_x_fix = 0.5
-        self.tag([(x, y) for x in range(start_x, end_x+1)], CLASS_LINE)
+        self._tag_span(start_x, y, end_x, y, CLASS_LINE)
         # return the new shape object with arrows etc.
         p1 = complex(self.left(start_x + start_x_fix), self.vcenter(y))
         p2 = complex(self.right(end_x + end_x_fix), self.vcenter(y))
@@ -613,9 +1543,13 @@ class AsciiArtImage:
         if line_end_style:
             p2, arrow_shapes = line_end_style(p2, p1)
             shapes.extend(arrow_shapes)
-        shapes.append(Line(p1, p2, thick=thick))
+        shapes.append(new(Line, (self._point(p1), self._point(p2), thick)))
         return group(shapes)
 
+    def _follow_thick_horizontal_line(self, x, y):
+        """Find a horizontal line drawn with '='."""
+        return self._follow_horizontal_line(x, y, thick=True)
+
     def _follow_lower_horizontal_line(self, x, y):
         """\
         Find a horizontal line, the line is aligned to the bottom and a bit
@@ -627,11 +1561,11 @@ class AsciiArtImage:
         end_x, _, line_end_style = self._follow_line(x, y, dx=1, line_character='_', arrows=False)
         # follow line to the left
         start_x, _, line_start_style = self._follow_line(x, y, dx=-1, line_character='_', arrows=False)
-        self.tag([(x, y) for x in range(start_x, end_x + 1)], CLASS_LINE)
+        self._tag_span(start_x, y, end_x, y, CLASS_LINE)
         # return the new shape object with arrows etc.
         p1 = complex(self.hcenter(start_x - 1), self.bottom(y))
         p2 = complex(self.hcenter(end_x + 1), self.bottom(y))
-        return [Line(p1, p2)]
+        return [new(Line, (self._point(p1), self._point(p2), False))]
 
     def _follow_upper_horizontal_line(self, x, y):
         """\
@@ -645,28 +1579,43 @@ class AsciiArtImage:
         end_x, _, line_end_style = self._follow_line(x, y, dx=1, line_character='~', arrows=False)
         # follow line to the left
         start_x, _, line_start_style = self._follow_line(x, y, dx=-1, line_character='~', arrows=False)
-        self.tag([(x, y) for x in range(start_x, end_x + 1)], CLASS_LINE)
+        self._tag_span(start_x, y, end_x, y, CLASS_LINE)
         # return the new shape object with arrows etc.
         p1 = complex(self.hcenter(start_x - 1), self.top(y))
         p2 = complex(self.hcenter(end_x + 1), self.top(y))
-        return [Line(p1, p2)]
+        return [new(Line, (self._point(p1), self._point(p2), False))]
 
     def _follow_line(self, x, y, dx=0, dy=0, line_character=None, arrows=True):
         """Helper function for all the line functions."""
-        # follow line in the given direction
-        while 0 <= x < self.width and 0 <= y < self.height and self.get(x+dx, y+dy) == line_character:
-            x += dx
-            y += dy
+        i = (y + 1) * self._stride + x + 1
+        if dy:
+            run_id = self._vrun_ids[i]
+            runs = self._vruns
+        else:
+            run_id = self._hrun_ids[i]
+            runs = self._hruns
+        if run_id and self._chars[i] == line_character:
+            # jump to the end of the line using the run table
+            start, end = runs[run_id]
+            if dx + dy > 0:
+                offset = end - i
+            else:
+                offset = start - i
+            if dy:
+                y += offset // self._stride
+            else:
+                x += offset
+        else:
+            # follow line in the given direction
+            while 0 <= x < self.width and 0 <= y < self.height and self.get(x+dx, y+dy) == line_character:
+                x += dx
+                y += dy
         if arrows:
             # check for arrow head
-            following_character = self.get(x + dx, y + dy)
-            if following_character in self.ARROW_HEADS:
-                line_end_style = self.get_arrow(following_character, dx, dy)
-                if line_end_style:
-                    x += dx
-                    y += dy
-            else:
-                line_end_style = None
+            line_end_style = self.get_arrow(self.get(x + dx, y + dy), dx, dy)
+            if line_end_style:
+                x += dx
+                y += dy
         else:
             line_end_style = None
         return x, y, line_end_style
@@ -684,15 +1633,177 @@ class AsciiArtImage:
         #~ for dx, dy in ((1,0), (-1,0), (0,1), (0,-1)):
         # looking right and down is sufficient as the scan is done from left to
         # right, top to bottom
+        i = (y + 1) * self._stride + x + 1
         for dx, dy in ((1, 0), (0, 1)):
-            if self.get(x + dx, y + dy) == '+':
-                result.append(Line(
-                    Point(self.hcenter(x), self.vcenter(y)),
-                    Point(self.hcenter(x + dx), self.vcenter(y + dy))
-                ))
+            if self.get(x + dx, y + dy) == '+' and (i, i + dy * self._stride + dx) not in self._box_links:
+                result.append(new(Line, (
+                    new(Point, (self.hcenter(x), self.vcenter(y))),
+                    new(Point, (self.hcenter(x + dx), self.vcenter(y + dy))),
+                    False)))
         self.tag([(x, y)], CLASS_JOIN)
         return result
 
+    def _claim_line(self, x, y):
+        """Tag the characters of a line, including its arrow heads"""
+        character = self.get(x, y)
+        arrows = character in '-=|'
+        dx, dy = (0, 1) if character == '|' else (1, 0)
+        end_x, end_y, _ = self._follow_line(x, y, dx, dy, character, arrows)
+        start_x, start_y, _ = self._follow_line(x, y, -dx, -dy, character, arrows)
+        self._tag_span(start_x, start_y, end_x, end_y, CLASS_LINE)
+
+    def _claim_rounded_edge(self, x, y):
+        """Tag the character if it is an edge (see ``_follow_rounded_edge``)"""
+        if self._edge_template((y + 1) * self._stride + x + 1):
+            self.tag([(x, y)], CLASS_JOIN)
+
+    def _claim_join(self, x, y):
+        """Tag a '+'"""
+        self.tag([(x, y)], CLASS_JOIN)
+
+    def _claim_fill(self, x, y):
+        """Tag the characters of a fill (see ``_start_fill``)"""
+        if not self.textual_strict:
+            character = self.get(x, y)
+            if self.get(x, y + 1) == character or (not self.textual and self.get(x + 1, y) == character):
+                self._fill_spans(character, x, y)
+
+    def _claim_fixed_character(self, x, y):
+        """Tag a character from FIXED_TYPES"""
+        self.tag([(x, y)], CLASS_FIXED)
+
+    # - - - - - - - - - box detection - - - - - - - - -
+    # corner characters of boxes: upper left, upper right, lower left, lower
+    # right
+    BOX_CORNERS = ['++++', '/\\\\/']
+
+    def _find_boxes(self):
+        """\
+        Find closed boxes and return them as outlined ``Rectangle`` shapes:
+
+            +---+
+            |   |
+            +---+
+
+        Boxes with slashes as corners get rounded corners. The edges may
+        contain '+' where other lines are attached. The '+'
+        are not tagged, so that lines touching them are still joined, but
+        adjacent '+' on a side are not joined again (see ``_box_links``). When
+        boxes share a side, it is drawn by each of them.
+        """
+        chars = self._chars
+        classes = self._classes
+        stride = self._stride
+        shapes = []
+        for i in self._occupied:
+            if (chars[i] in '+/' and not classes[i]
+                    and chars[i + 1] in '-=' and chars[i + stride] in '|+'):
+                shapes.extend(self._follow_box(i))
+        return shapes
+
+    def _follow_box(self, i):
+        """\
+        Try to find a box with the upper left corner at grid index ``i``.
+        The smallest box is taken if there are several candidates.
+        """
+        chars = self._chars
+        stride = self._stride
+        corners = self.BOX_CORNERS[chars[i] != '+']
+        edge = chars[i + 1]
+        # candidates for the upper right and the lower left corner
+        upper_right = []
+        j = i + 1
+        while chars[j] == edge or chars[j] == '+':
+            j += 1
+            if chars[j] == corners[1] and j > i + 1:
+                upper_right.append(j)
+        lower_left = []
+        j = i + stride
+        while chars[j] == '|' or chars[j] == '+':
+            j += stride
+            if chars[j] == corners[2] and j > i + stride:
+                lower_left.append(j)
+        for j in upper_right:
+            for k in lower_left:
+                lower_right = k + j - i
+                if (chars[lower_right] == corners[3]
+                        and self._box_edges(i, j, k, lower_right, edge)):
+                    return self._box(i, j, k, lower_right, edge)
+        return []
+
+    def _box_edges(self, upper_left, upper_right, lower_left, lower_right, edge):
+        """\
+        Check that the sides between the corners are complete and not yet
+        used by other shapes (except other boxes). Rounded corners must not
+        be part of any other shape.
+        """
+        chars = self._chars
+        classes = self._classes
+        stride = self._stride
+        line = CLASS_CODES[CLASS_LINE]
+        for start, end, step, character in (
+                (upper_left, upper_right, 1, edge),
+                (lower_left, lower_right, 1, edge),
+                (upper_left, lower_left, stride, '|'),
+                (upper_right, lower_right, stride, '|')):
+            for j in range(start + step, end, step):
+                if (chars[j] != character and chars[j] != '+') or classes[j] not in (0, line):
+                    return False
+        if chars[upper_left] != '+':
+            for j in (upper_left, upper_right, lower_left, lower_right):
+                if classes[j] or len(self._edge_template(j)) != 1:
+                    return False
+        return True
+
+    def _box(self, upper_left, upper_right, lower_left, lower_right, edge):
+        """Tag the cells of a box and return the ``Rectangle``."""
+        chars = self._chars
+        stride = self._stride
+        y1, x1 = divmod(upper_left, stride)
+        y2, x2 = divmod(lower_right, stride)
+        x1, y1, x2, y2 = x1 - 1, y1 - 1, x2 - 1, y2 - 1
+        classes = self._classes
+        line = CLASS_CODES[CLASS_LINE]
+        for start, end, step in (
+                (upper_left, upper_right, 1),
+                (lower_left, lower_right, 1),
+                (upper_left, lower_left, stride),
+                (upper_right, lower_right, stride)):
+            for j in range(start + step, end, step):
+                if chars[j] != '+':
+                    classes[j] = line
+            # the box side replaces the joins of adjacent '+'
+            for j in range(start, end, step):
+                if chars[j] == '+' and chars[j + step] == '+':
+                    self._box_links.add((j, j + step))
+        if chars[upper_left] == '+':
+            rx = ry = 0
+        else:
+            self.tag([(x1, y1), (x2, y1), (x1, y2), (x2, y2)], CLASS_JOIN)
+            rx = self.hcenter(0) - self.left(0)
+            ry = self.vcenter(0) - self.top(0)
+        return [Rectangle(
+            Point(self.hcenter(x1), self.vcenter(y1)),
+            Point(self.hcenter(x2), self.vcenter(y2)),
+            filled=False, thick=(edge == '='), rx=rx, ry=ry)]
+
+    def _fixed_character(self, x, y):
+        """Draw a character from FIXED_TYPES."""
+        shapes = self._fixed[self.get(x, y)](x, y)
+        self.tag([(x, y)], CLASS_FIXED)
+        return shapes
+
+    def _start_fill(self, x, y):
+        """\
+        Start a fill if the character is repeated (vertically in textual
+        mode, vertically or horizontally otherwise).
+        """
+        if not self.textual_strict:
+            character = self.get(x, y)
+            if self.get(x, y + 1) == character or (not self.textual and self.get(x + 1, y) == character):
+                return self._follow_fill(character, x, y)
+        return []
+
     def _follow_fill(self, character, start_x, start_y):
         """\
         Fill shapes like the ones below with a pattern. when the character is
@@ -701,47 +1812,177 @@ class AsciiArtImage:
             XXX  aaa  BB
            XXX    a
         """
-        fill = self.get_fill(character.upper())
+        pattern = self._simpler_fills.get(character.upper(), character.upper())
+        fill = self.get_fill(pattern)
         border = character.isupper()
-        result = []
-        # flood fill algorithm, searching for similar characters
-        to_scan = [(start_x, start_y)]
-        while to_scan:
-            x, y = to_scan.pop()
-            if self.cls(x, y) is None:
-                if self.get(x, y) == character:
+        spans = self._fill_spans(character, start_x, start_y)
+        if self.merge_hatches:
+            region_fill = self._region_fills.get(pattern)
+        else:
+            region_fill = None
+        if region_fill is not None:
+            result = region_fill(self, spans)
+        else:
+            result = []
+        if border and self.merge_borders:
+            result.extend(self._trace_outline(character, spans))
+            border = False
+        chars = self._chars
+        stride = self._stride
+        for start, end in spans:
+            y = start // stride - 1
+            for i in range(start, end + 1):
+                x = i - (y + 1) * stride - 1
+                if region_fill is None:
                     result.extend(fill(x, y))
-                    self.tag([(x, y)], CLASS_RECTANGLE)
-                if self.get(x + 1, y) == character:
-                    if self.cls(x + 1, y) is None:
-                        to_scan.append((x + 1, y))
-                elif border:
-                    result.append(Line(
-                        Point(self.right(x), self.top(y)),
-                        Point(self.right(x), self.bottom(y))))
-                if self.get(x - 1, y) == character:
-                    if self.cls(x - 1, y) is None:
-                        to_scan.append((x - 1, y))
-                elif border:
-                    result.append(Line(
-                        Point(self.left(x), self.top(y)),
-                        Point(self.left(x), self.bottom(y))))
-                if self.get(x, y + 1) == character:
-                    if self.cls(x, y + 1) is None:
-                        to_scan.append((x, y + 1))
-                elif border:
-                    result.append(Line(
-                        Point(self.left(x), self.bottom(y)),
-                        Point(self.right(x), self.bottom(y))))
-                if self.get(x, y - 1) == character:
-                    if self.cls(x, y - 1) is None:
-                        to_scan.append((x, y - 1))
-                elif border:
-                    result.append(Line(
-                        Point(self.left(x), self.top(y)),
-                        Point(self.right(x), self.top(y))))
+                if border:
+                    if chars[i + 1] != character:
+                        result.append(new(Line, (
+                            new(Point, (self.right(x), self.top(y))),
+                            new(Point, (self.right(x), self.bottom(y))),
+                            False)))
+                    if chars[i - 1] != character:
+                        result.append(new(Line, (
+                            new(Point, (self.left(x), self.top(y))),
+                            new(Point, (self.left(x), self.bottom(y))),
+                            False)))
+                    if chars[i + stride] != character:
+                        result.append(new(Line, (
+                            new(Point, (self.left(x), self.bottom(y))),
+                            new(Point, (self.right(x), self.bottom(y))),
+                            False)))
+                    if chars[i - stride] != character:
+                        result.append(new(Line, (
+                            new(Point, (self.left(x), self.top(y))),
+                            new(Point, (self.right(x), self.top(y))),
+                            False)))
         return group(result)
 
+    def _trace_outline(self, character, spans):
+        """\
+        Find the border of a fill region as closed polygons (one for the
+        outside and one for each hole). Edges are only drawn where the
+        neighbor is a different character, so when a region touches the
+        same character that is used otherwise, the border is not closed and
+        polylines are returned for these parts.
+        """
+        chars = self._chars
+        stride = self._stride
+        # directed edges between cell corners, the region is on the right
+        # side when following an edge
+        edges = {}
+        incoming = {}
+
+        def add(start, end):
+            edges.setdefault(start, []).append(end)
+            incoming[end] = incoming.get(end, 0) + 1
+
+        for start, end in spans:
+            y = start // stride - 1
+            for i in range(start, end + 1):
+                x = i - (y + 1) * stride - 1
+                if chars[i - stride] != character:
+                    add((x, y), (x + 1, y))
+                if chars[i + 1] != character:
+                    add((x + 1, y), (x + 1, y + 1))
+                if chars[i + stride] != character:
+                    add((x + 1, y + 1), (x, y + 1))
+                if chars[i - 1] != character:
+                    add((x, y + 1), (x, y))
+
+        def follow(vertex):
+            path = [vertex]
+            direction = None
+            while edges.get(vertex):
+                ends = edges[vertex]
+                if direction is not None and len(ends) > 1:
+                    # two cells touching at a corner, turn away from the
+                    # other cell so that the outlines are kept separate
+                    left = (vertex[0] + direction[1], vertex[1] - direction[0])
+                    end = left if left in ends else ends[0]
+                else:
+                    end = ends[0]
+                ends.remove(end)
+                direction = (end[0] - vertex[0], end[1] - vertex[1])
+                vertex = end
+                path.append(vertex)
+                if vertex == path[0]:
+                    break
+            return path
+
+        paths = []
+        # open borders start where an edge is missing
+        for vertex in sorted(edges):
+            while len(edges[vertex]) > incoming.get(vertex, 0):
+                incoming[vertex] = incoming.get(vertex, 0) + 1
+                paths.append(follow(vertex))
+        for vertex in sorted(edges):
+            while edges[vertex]:
+                paths.append(follow(vertex))
+
+        result = []
+        for path in paths:
+            closed = len(path) > 2 and path[0] == path[-1]
+            if closed:
+                del path[-1]
+            path = self._remove_collinear(path, closed)
+            points = [Point(self.left(x), self.top(y)) for x, y in path]
+            if len(points) == 2 and not closed:
+                result.append(Line(points[0], points[1]))
+            else:
+                result.append(Polyline(points, closed))
+        return result
+
+    @staticmethod
+    def _remove_collinear(path, closed):
+        """Remove points from a path of cell corners that are on a straight segment"""
+        def corner(previous, vertex, following):
+            return (vertex[0] - previous[0]) * (following[1] - vertex[1]) != \
+                   (vertex[1] - previous[1]) * (following[0] - vertex[0])
+        if closed:
+            return [vertex for n, vertex in enumerate(path)
+                    if corner(path[n - 1], vertex, path[(n + 1) % len(path)])]
+        else:
+            return path[:1] + [path[n] for n in range(1, len(path) - 1)
+                               if corner(path[n - 1], path[n], path[n + 1])] + path[-1:]
+
+    def _fill_spans(self, character, start_x, start_y):
+        """\
+        Scanline flood fill, searching for similar characters that are not
+        yet used. The found cells are tagged. Returns a sorted list of
+        horizontal spans, each one a tuple with the grid index of the first
+        and last cell.
+        """
+        chars = self._chars
+        classes = self._classes
+        stride = self._stride
+        code = bytearray([CLASS_CODES[CLASS_RECTANGLE]])
+        spans = []
+        to_scan = [(start_y + 1) * stride + start_x + 1]
+        while to_scan:
+            i = to_scan.pop()
+            if classes[i] or chars[i] != character:
+                continue
+            # extend the span to the left and right
+            start = end = i
+            while chars[start - 1] == character and not classes[start - 1]:
+                start -= 1
+            while chars[end + 1] == character and not classes[end + 1]:
+                end += 1
+            classes[start:end + 1] = code * (end - start + 1)
+            spans.append((start, end))
+            # remember one cell per run of unused characters in the rows
+            # above and below
+            for row in (start - stride, start + stride):
+                previous = False
+                for j in range(row, row + end - start + 1):
+                    fillable = chars[j] == character and not classes[j]
+                    if fillable and not previous:
+                        to_scan.append(j)
+                    previous = fillable
+        spans.sort()
+        return spans
+
     def _follow_horizontal_string(self, start_x, y, accept_anything=False, quoted=False):
         """\
         Find a string. may contain single spaces, but the detection is
@@ -784,10 +2025,9 @@ class AsciiArtImage:
                 del text[-1]
                 x -= 1
             self.tag([(x, y) for x in range(start_x, x + 1)], CLASS_STRING)
-            return [Label(
-                Point(self.left(start_x), self.bottom(y)),
-                ''.join(text)
-            )]
+            return [new(Label, (
+                new(Point, (self.left(start_x), self.bottom(y))),
+                ''.join(text)))]
         else:
             return []
 
@@ -796,148 +2036,384 @@ class AsciiArtImage:
         Check for rounded edges:
             /-    |     -\-    |   and also \    /  etc.
             |    -/      |     \-            -  |
+
+        The decision only depends on the 3x3 neighborhood of the character.
+        It is looked up in a table (see ``rounded_edge_template``) that
+        contains the end points relative to the cell.
         """
         result = []
-        if self.get(x, y) == '/':
-            # rounded rectangles
-            if (self.get(x + 1, y) == '-' and self.get(x, y + 1) == '|'):
-                # upper left corner
-                result.append(Arc(
-                    Point(self.hcenter(x), self.bottom(y)), 90,
-                    Point(self.right(x), self.vcenter(y)),  180
-                ))
-            if self.get(x - 1, y) == '-' and self.get(x, y - 1) == '|':
-                # lower right corner
-                result.append(Arc(
-                    Point(self.hcenter(x), self.top(y)), -90,
-                    Point(self.left(x), self.vcenter(y)), 0
-                ))
-            if not result:
-                # if used as diagonal line
-                p1 = p2 = None
-                a1 = a2 = 0
-                arc = c1 = c2 = False
-                if self.get(x + 1, y - 1) == '|':
-                    p1 = Point(self.hcenter(x + 1), self.top(y))
-                    a1 = -90
-                    arc = c1 = True
-                elif self.get(x + 1, y - 1) == '+':
-                    p1 = Point(self.hcenter(x + 1), self.vcenter(y - 1))
-                    a1 = -135
-                elif self.get(x + 1, y - 1) == '-':
-                    p1 = Point(self.right(x), self.vcenter(y - 1))
-                    a1 = 180
-                    arc = c1 = True
-                elif self.get(x + 1, y - 1) == '/':
-                    p1 = Point(self.right(x), self.top(y))
-                    a1 = -135
-                    c1 = True
-                elif self.get(x + 1, y) == '|':
-                    p1 = Point(self.hcenter(x + 1), self.top(y))
-                elif self.get(x, y - 1) == '-':
-                    p1 = Point(self.right(x), self.vcenter(y - 1))
-
-                if self.get(x - 1, y + 1) == '|':
-                    p2 = Point(self.hcenter(x - 1), self.top(y + 1))
-                    a2 = 90
-                    arc = c2 = True
-                elif self.get(x - 1, y + 1) == '+':
-                    p2 = Point(self.hcenter(x - 1), self.vcenter(y + 1))
-                    a2 = 45
-                elif self.get(x - 1, y + 1) == '-':
-                    p2 = Point(self.left(x), self.vcenter(y + 1))
-                    a2 = 0
-                    arc = c2 = True
-                elif self.get(x - 1, y + 1) == '/':
-                    p2 = Point(self.left(x), self.bottom(y))
-                    a2 = 45
-                    c2 = True
-                elif self.get(x - 1, y) == '|':
-                    p2 = Point(self.hcenter(x - 1), self.bottom(y))
-                elif self.get(x, y + 1) == '-':
-                    p2 = Point(self.left(x), self.vcenter(y + 1))
-
-                if p1 or p2:
-                    if not p1:
-                        p1 = Point(self.right(x), self.top(y))
-                    if not p2:
-                        p2 = Point(self.left(x), self.bottom(y))
-                    if arc and self.rounded:
-                        result.append(Arc(p1, a1, p2, a2, c1, c2))
-                    else:
-                        result.append(Line(p1, p2))
-        else:  # '\'
-            # rounded rectangles
-            if self.get(x-1, y) == '-' and self.get(x, y + 1) == '|':
-                # upper right corner
-                result.append(Arc(
-                    Point(self.hcenter(x), self.bottom(y)), 90,
-                    Point(self.left(x), self.vcenter(y)), 0
-                ))
-            if self.get(x+1, y) == '-' and self.get(x, y - 1) == '|':
-                # lower left corner
-                result.append(Arc(
-                    Point(self.hcenter(x), self.top(y)), -90,
-                    Point(self.right(x), self.vcenter(y)), 180
-                ))
-            if not result:
-                # if used as diagonal line
-                p1 = p2 = None
-                a1 = a2 = 0
-                arc = c1 = c2 = False
-                if self.get(x - 1, y - 1) == '|':
-                    p1 = Point(self.hcenter(x-1), self.top(y))
-                    a1 = -90
-                    arc = c1 = True
-                elif self.get(x - 1, y - 1) == '+':
-                    p1 = Point(self.hcenter(x-1), self.vcenter(y - 1))
-                    a1 = -45
-                elif self.get(x - 1, y - 1) == '-':
-                    p1 = Point(self.left(x), self.vcenter(y-1))
-                    a1 = 0
-                    arc = c1 = True
-                elif self.get(x - 1, y - 1) == '\\':
-                    p1 = Point(self.left(x), self.top(y))
-                    a1 = -45
-                    c1 = True
-                elif self.get(x - 1, y) == '|':
-                    p1 = Point(self.hcenter(x-1), self.top(y))
-                elif self.get(x, y - 1) == '-':
-                    p1 = Point(self.left(x), self.hcenter(y - 1))
-
-                if self.get(x + 1, y + 1) == '|':
-                    p2 = Point(self.hcenter(x+1), self.top(y + 1))
-                    a2 = 90
-                    arc = c2 = True
-                elif self.get(x + 1, y + 1) == '+':
-                    p2 = Point(self.hcenter(x+1), self.vcenter(y + 1))
-                    a2 = 135
-                elif self.get(x + 1, y + 1) == '-':
-                    p2 = Point(self.right(x), self.vcenter(y + 1))
-                    a2 = 180
-                    arc = c2 = True
-                elif self.get(x + 1, y + 1) == '\\':
-                    p2 = Point(self.right(x), self.bottom(y))
-                    a2 = 135
-                    c2 = True
-                elif self.get(x + 1, y) == '|':
-                    p2 = Point(self.hcenter(x+1), self.bottom(y))
-                elif self.get(x, y + 1) == '-':
-                    p2 = Point(self.right(x), self.vcenter(y + 1))
-
-                if p1 or p2:
-                    if not p1:
-                        p1 = Point(self.left(x), self.top(y))
-                    if not p2:
-                        p2 = Point(self.right(x), self.bottom(y))
-                    if arc and self.rounded:
-                        result.append(Arc(p1, a1, p2, a2, c1, c2))
-                    else:
-                        result.append(Line(p1, p2))
+        template = self._edge_template((y + 1) * self._stride + x + 1)
+        for (fx1, fy1), a1, (fx2, fy2), a2, c1, c2, kind in template:
+            p1 = new(Point, (self.left(x + fx1), self.top(y + fy1)))
+            p2 = new(Point, (self.left(x + fx2), self.top(y + fy2)))
+            if kind == 'arc' or (kind == 'rounded' and self.rounded):
+                result.append(new(Arc, (p1, a1, p2, a2, c1, c2)))
+            else:
+                result.append(new(Line, (p1, p2, False)))
         if result:
             self.tag([(x, y)], CLASS_JOIN)
         return group(result)
 
+    def _edge_template(self, i):
+        """Look up the rounded edge template for the cell at grid index i"""
+        stride = self._stride
+        chars = self._chars
+        neighborhood = NOT_AN_EDGE.sub(' ', ''.join((
+            chars[i - stride - 1:i - stride + 2],
+            chars[i - 1:i + 2],
+            chars[i + stride - 1:i + stride + 2])))
+        try:
+            return ROUNDED_EDGE_TEMPLATES[neighborhood]
+        except KeyError:
+            template = ROUNDED_EDGE_TEMPLATES[neighborhood] = rounded_edge_template(neighborhood)
+            return template
+
+
+# characters that are relevant for the rounded edge detection, all others are
+# replaced by spaces
+NOT_AN_EDGE = re.compile(r'[^-|+/\\]')
+
+# cache for rounded_edge_template, keys are neighborhoods
+ROUNDED_EDGE_TEMPLATES = {}
+
+
+def rounded_edge_template(neighborhood):
+    """\
+    Find the shapes for a slash or backslash character. ``neighborhood`` is a
+    string with the 3x3 characters around it (row by row, the edge character
+    in the center).
+
+    Returns a tuple of ``(p1, a1, p2, a2, c1, c2, kind)`` entries, where the
+    points are offsets in cells, to be added to the coordinates of the
+    character before scaling. ``kind`` is ``'arc'`` or ``'line'`` or
+    ``'rounded'`` for shapes that are drawn as ``Arc`` only when the
+    ``rounded`` option is set.
+    """
+    nw, n, ne, w, center, e, sw, s, se = neighborhood
+    result = []
+    if center == '/':
+        # rounded rectangles
+        if e == '-' and s == '|':
+            # upper left corner
+            result.append(((0.5, 1), 90, (1, 0.5), 180, True, True, 'arc'))
+        if w == '-' and n == '|':
+            # lower right corner
+            result.append(((0.5, 0), -90, (0, 0.5), 0, True, True, 'arc'))
+        if not result:
+            # if used as diagonal line
+            p1 = p2 = None
+            a1 = a2 = 0
+            arc = c1 = c2 = False
+            if ne == '|':
+                p1 = (1.5, 0)
+                a1 = -90
+                arc = c1 = True
+            elif ne == '+':
+                p1 = (1.5, -0.5)
+                a1 = -135
+            elif ne == '-':
+                p1 = (1, -0.5)
+                a1 = 180
+                arc = c1 = True
+            elif ne == '/':
+                p1 = (1, 0)
+                a1 = -135
+                c1 = True
+            elif e == '|':
+                p1 = (1.5, 0)
+            elif n == '-':
+                p1 = (1, -0.5)
+
+            if sw == '|':
+                p2 = (-0.5, 1)
+                a2 = 90
+                arc = c2 = True
+            elif sw == '+':
+                p2 = (-0.5, 1.5)
+                a2 = 45
+            elif sw == '-':
+                p2 = (0, 1.5)
+                a2 = 0
+                arc = c2 = True
+            elif sw == '/':
+                p2 = (0, 1)
+                a2 = 45
+                c2 = True
+            elif w == '|':
+                p2 = (-0.5, 1)
+            elif s == '-':
+                p2 = (0, 1.5)
+
+            if p1 or p2:
+                if not p1:
+                    p1 = (1, 0)
+                if not p2:
+                    p2 = (0, 1)
+                result.append((p1, a1, p2, a2, c1, c2, 'rounded' if arc else 'line'))
+    else:  # '\'
+        # rounded rectangles
+        if w == '-' and s == '|':
+            # upper right corner
+            result.append(((0.5, 1), 90, (0, 0.5), 0, True, True, 'arc'))
+        if e == '-' and n == '|':
+            # lower left corner
+            result.append(((0.5, 0), -90, (1, 0.5), 180, True, True, 'arc'))
+        if not result:
+            # if used as diagonal line
+            p1 = p2 = None
+            a1 = a2 = 0
+            arc = c1 = c2 = False
+            if nw == '|':
+                p1 = (-0.5, 0)
+                a1 = -90
+                arc = c1 = True
+            elif nw == '+':
+                p1 = (-0.5, -0.5)
+                a1 = -45
+            elif nw == '-':
+                p1 = (0, -0.5)
+                a1 = 0
+                arc = c1 = True
+            elif nw == '\\':
+                p1 = (0, 0)
+                a1 = -45
+                c1 = True
+            elif w == '|':
+                p1 = (-0.5, 0)
+            elif n == '-':
+                p1 = (0, -0.5)
+
+            if se == '|':
+                p2 = (1.5, 1)
+                a2 = 90
+                arc = c2 = True
+            elif se == '+':
+                p2 = (1.5, 1.5)
+                a2 = 135
+            elif se == '-':
+                p2 = (1, 1.5)
+                a2 = 180
+                arc = c2 = True
+            elif se == '\\':
+                p2 = (1, 1)
+                a2 = 135
+                c2 = True
+            elif e == '|':
+                p2 = (1.5, 1)
+            elif s == '-':
+                p2 = (1, 1.5)
+
+            if p1 or p2:
+                if not p1:
+                    p1 = (0, 0)
+                if not p2:
+                    p2 = (1, 1)
+                result.append((p1, a1, p2, a2, c1, c2, 'rounded' if arc else 'line'))
+    return tuple(result)
+
+
+def _occupied_columns(line):
+    """Return the set of columns of a (padded) line that are not spaces"""
+    return set(m.start() for m in NON_SPACE.finditer(line))
+
+
+def _touching(columns, other_columns):
+    """\
+    Test if a character of one line is next to (or diagonally touching) a
+    character of the other line, given their occupied columns.
+    """
+    for x in columns:
+        if x - 1 in other_columns or x in other_columns or x + 1 in other_columns:
+            return True
+    return False
+
+
+def recognize_lines(lines, options=None):
+    """\
+    Recognize a figure line by line and yield the shapes (in drawing units)
+    as soon as they are complete.
+
+    :param lines: Iterable of text lines, e.g. a file object. Line ends
+        are removed.
+
+    :param options: A dictionary containing the settings. The ``viewport``
+        and ``spatial_index`` options are not supported.
+
+    The lines are collected in bands. A band ends at a line that has no
+    character next to (or diagonally touching) a character of the line
+    above, nothing can be connected across this border. Each band is
+    recognized on its own, so only one band has to be kept in memory. The
+    shapes are the same as those of the whole image, but in a different
+    order.
+    """
+    if options is None:
+        options = {}
+    options = dict(options, viewport=None, spatial_index=False)
+    widths = padding_table(options.get('widechars', 'F,W'))
+    band = []
+    top = 0
+    previous = set()
+    for y, line in enumerate(lines):
+        line = line.rstrip('\r\n')
+        # columns of the characters, after padding wide glyphs
+        padded_line = pad_line(line, widths)
+        columns = _occupied_columns(padded_line)
+        if not _touching(columns, previous):
+            for shape in _recognize_band(band, top, options):
+                yield shape
+            band = []
+            top = y
+        if columns:
+            band.append(line)
+        else:
+            top = y + 1
+        previous = columns
+    for shape in _recognize_band(band, top, options):
+        yield shape
+
+
+def _band_rows(rows, start, end):
+    """\
+    Extend the rows ``start`` to ``end`` (excluding ``end``) up and down to
+    the ends of the bands they are part of. Return the new start and end.
+    """
+    columns = _occupied_columns(rows[start]) if start < len(rows) else set()
+    while start > 0:
+        above = _occupied_columns(rows[start - 1])
+        if not _touching(columns, above):
+            break
+        start -= 1
+        columns = above
+    columns = _occupied_columns(rows[end - 1]) if end > 0 else set()
+    while end < len(rows):
+        below = _occupied_columns(rows[end])
+        if not _touching(columns, below):
+            break
+        end += 1
+        columns = below
+    return start, end
+
+
+# non space characters with single spaces between them, as in strings
+SEGMENTS = re.compile(r'[^ ]+(?: [^ ]+)*')
+# runs of tagged cells in a classification table
+TAGGED = re.compile(b'[^\x00]+')
+
+
+def _components(rows):
+    """\
+    Find the parts of an image (given as list of padded rows) that are not
+    connected, i.e. that can be recognized independently. Returns a list
+    of components, each a list of ``(y, start, end)`` segments of rows,
+    sorted by the first row.
+
+    The segments of a row are runs of characters with single spaces
+    between them, they may be a string. Quoted strings can contain more
+    spaces, so the rest of a row with a quotation character is one
+    segment. Segments are connected when they are next to each other, or
+    diagonally touching, in neighboring rows.
+    """
+    quotes = AsciiArtImage.QUOTATION_CHARACTERS
+    segments = []
+    parents = []
+
+    def find(n):
+        while parents[n] != n:
+            parents[n] = parents[parents[n]]
+            n = parents[n]
+        return n
+
+    previous = []
+    for y, row in enumerate(rows):
+        current = []
+        quoted = False
+        for match in SEGMENTS.finditer(row):
+            start, end = match.span()
+            if quoted:
+                # after a quotation character, join with the last segment
+                n = current[-1]
+                segments[n] = (y, segments[n][1], end)
+                continue
+            n = len(segments)
+            segments.append((y, start, end))
+            parents.append(n)
+            current.append(n)
+            quoted = any(q in match.group() for q in quotes)
+        # join with the touching segments of the row above
+        i = 0
+        for n in current:
+            start, end = segments[n][1:]
+            while i < len(previous) and segments[previous[i]][2] < start:
+                i += 1
+            j = i
+            while j < len(previous) and segments[previous[j]][1] <= end:
+                parents[find(previous[j])] = find(n)
+                j += 1
+        previous = current
+    components = {}
+    for n, segment in enumerate(segments):
+        components.setdefault(find(n), []).append(segment)
+    return sorted(components.values())
+
+
+def _partition(components, count):
+    """\
+    Combine the components (see ``_components``) into about ``count``
+    parts with similar numbers of characters. Components are kept in
+    order, so that parts are mostly bands of rows.
+    """
+    size = sum(end - start for component in components for y, start, end in component)
+    limit = size / float(count)
+    parts = []
+    part = []
+    part_size = 0
+    for component in components:
+        part.extend(component)
+        part_size += sum(end - start for y, start, end in component)
+        if part_size >= limit:
+            parts.append(sorted(part))
+            part = []
+            part_size = 0
+    if part:
+        parts.append(sorted(part))
+    return parts
+
+
+def _only_segments(row, segments):
+    """Helper for _recognize_parts: the row with only the characters of the segments"""
+    pieces = []
+    position = 0
+    for start, end in segments:
+        pieces.append(' ' * (start - position))
+        pieces.append(row[start:end])
+        position = end
+    return ''.join(pieces)
+
+
+def _recognize_part(task):
+    """\
+    Helper for _recognize_parts, called in the worker processes: recognize
+    a part of an image. Returns the shapes as ``ShapeTable``, the
+    statistics and the classification table.
+    """
+    image_class, text, top, width, options = task
+    lines = text.split('\n')
+    lines[0] = lines[0].ljust(width)
+    aaimg = image_class('\n'.join(lines), options)
+    aaimg._origin_y = top
+    aaimg.recognize()
+    return ShapeTable.from_shapes(aaimg.shapes), aaimg.statistics, aaimg._classes
+
+
+def _recognize_band(band, top, options):
+    """Helper for recognize_lines: recognize lines starting at row ``top``"""
+    if not band:
+        return []
+    aaimg = AsciiArtImage('\n'.join(band), options)
+    aaimg._origin_y = top
+    aaimg.recognize()
+    return aaimg.drawing_shapes()
+
 
 def process(input, visitor_class, options=None):
     """\
@@ -982,6 +2458,9 @@ def process(input, visitor_class, options=None):
     if options['debug']:
         sys.stderr.write('{}\n'.format(aaimg))
     aaimg.recognize()
+    if options['debug'] and aaimg.statistics:
+        sys.stderr.write('{}\n'.format(', '.join(
+            '{}: {}'.format(key, value) for key, value in sorted(aaimg.statistics.items()))))
 
     visitor = visitor_class(options)
     visitor.visit_image(aaimg)
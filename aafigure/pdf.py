@@ -39,6 +39,8 @@ class PDFOutputVisitor:
         """
         self.options = options
         self.scale = 4 * options['scale']
+        # scale for the coordinates of the shapes, see visit_image
+        self.shape_scale = self.scale
         self.line_width = 0.4 * options['line_width']
         self.foreground = options['foreground']
         self.background = options['background']
@@ -59,6 +61,10 @@ class PDFOutputVisitor:
         """helper to format numbers with scale for PDF output"""
         return number * self.scale
 
+    def _size(self, number):
+        """helper to scale sizes of shapes for PDF output"""
+        return number * self.shape_scale
+
     def _color(self, color):
         return colors.HexColor(color)
 
@@ -68,9 +74,14 @@ class PDFOutputVisitor:
         the PDF file
         """
         self.aa_image = aa_image        # save for later XXX not optimal to do it here
-        self.width = aa_image.width * aa_image.nominal_size * aa_image.aspect_ratio
-        self.height = aa_image.height * aa_image.nominal_size
+        width, height = aa_image.size()
+        self.width = width * aa_image.nominal_size * aa_image.aspect_ratio
+        self.height = height * aa_image.nominal_size
         self.drawing = Drawing(self._num(self.width), self._num(self.height))
+        # the coordinates of the shapes are in units of aa_image.unit, the
+        # y axis is flipped at the height in these units
+        self.shape_scale = self.scale * aa_image.unit
+        self.shape_height = self.height / aa_image.unit
         self.visit_shapes(aa_image.shapes)
         # if file is given, write
         if 'file_like' in self.options:
@@ -89,8 +100,8 @@ class PDFOutputVisitor:
     def _line(self, x1, y1, x2, y2, thick):
         """Draw a line, coordinates given as four decimal numbers"""
         self.drawing.add(Line(
-            self._num(x1), self._num(self.height - y1),
-            self._num(x2), self._num(self.height - y2),
+            self._size(x1), self._size(self.shape_height - y1),
+            self._size(x2), self._size(self.shape_height - y2),
             strokeColor=self._color(self.foreground),
             strokeWidth=self.line_width*(1 + 0.5 * bool(thick))))
 
@@ -101,8 +112,8 @@ class PDFOutputVisitor:
         if y1 > y2:
             y1, y2 = y2, y1
         self.drawing.add(Rect(
-            self._num(x1), self._num(self.height - y2),
-            self._num(x2 - x1), self._num(y2 - y1),
+            self._size(x1), self._size(self.shape_height - y2),
+            self._size(x2 - x1), self._size(y2 - y1),
             fillColor=self._color(self.fillcolor),
             strokeWidth=self.line_width))
 
@@ -110,7 +121,7 @@ class PDFOutputVisitor:
 
     def visit_point(self, point):
         self.drawing.add(Circle(
-            self._num(point.x), self._num(self.height - point.y),
+            self._size(point.x), self._size(self.shape_height - point.y),
             self._num(0.2),
             fillColor=self._color(self.foreground),
             strokeWidth=self.line_width))
@@ -120,15 +131,43 @@ class PDFOutputVisitor:
         y1, y2 = line.start.y, line.end.y
         self._line(x1, y1, x2, y2, line.thick)
 
+    def visit_polyline(self, polyline):
+        points = []
+        for p in polyline.points:
+            points.extend((self._size(p.x), self._size(self.shape_height - p.y)))
+        stroke_width = self.line_width * (1 + 0.5 * bool(polyline.thick))
+        if polyline.closed:
+            self.drawing.add(Polygon(
+                points,
+                strokeColor=self._color(self.foreground),
+                strokeWidth=stroke_width,
+                fillColor=None))
+        else:
+            self.drawing.add(PolyLine(
+                points,
+                strokeColor=self._color(self.foreground),
+                strokeWidth=stroke_width))
+
     def visit_rectangle(self, rectangle):
-        self._rectangle(
-            rectangle.p1.x, rectangle.p1.y,
-            rectangle.p2.x, rectangle.p2.y)
+        if rectangle.filled:
+            self._rectangle(
+                rectangle.p1.x, rectangle.p1.y,
+                rectangle.p2.x, rectangle.p2.y)
+        else:
+            x1, x2 = sorted((rectangle.p1.x, rectangle.p2.x))
+            y1, y2 = sorted((rectangle.p1.y, rectangle.p2.y))
+            self.drawing.add(Rect(
+                self._size(x1), self._size(self.shape_height - y2),
+                self._size(x2 - x1), self._size(y2 - y1),
+                rx=self._size(rectangle.rx), ry=self._size(rectangle.ry),
+                strokeColor=self._color(self.foreground),
+                fillColor=None,
+                strokeWidth=self.line_width * (1 + 0.5 * bool(rectangle.thick))))
 
     def visit_circle(self, circle):
         self.drawing.add(Circle(
-            self._num(circle.center.x), self._num(self.height - circle.center.y),
-            self._num(circle.radius),
+            self._size(circle.center.x), self._size(self.shape_height - circle.center.y),
+            self._size(circle.radius),
             strokeColor=self._color(self.foreground),
             fillColor=self._color(self.fillcolor),
             strokeWidth=self.line_width))
@@ -136,7 +175,7 @@ class PDFOutputVisitor:
     def visit_label(self, label):
         #  font-weight="bold"   style="stroke:%s"
         self.drawing.add(String(
-            self._num(label.position.x), self._num(self.height - label.position.y + self.aa_image.nominal_size * 0.2),
+            self._size(label.position.x), self._size(self.shape_height - label.position.y + self.aa_image.nominal_size * 0.2 / self.aa_image.unit),
             label.text,
             fontSize=self._num(self.aa_image.nominal_size),
             fontName=self.font,
@@ -152,8 +191,8 @@ class PDFOutputVisitor:
         c2 = arc.end_control_point()
         path = Path(strokeColor=self._color(self.foreground),
                     strokeWidth=self.line_width)
-        path.moveTo(self._num(p1.x), self._num(self.height - p1.y))
-        path.curveTo(self._num(c1.x), self._num(self.height - c1.y),
-                     self._num(c2.x), self._num(self.height - c2.y),
-                     self._num(p2.x), self._num(self.height - p2.y))
+        path.moveTo(self._size(p1.x), self._size(self.shape_height - p1.y))
+        path.curveTo(self._size(c1.x), self._size(self.shape_height - c1.y),
+                     self._size(c2.x), self._size(self.shape_height - c2.y),
+                     self._size(p2.x), self._size(self.shape_height - p2.y))
         self.drawing.add(path)
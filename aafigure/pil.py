@@ -10,6 +10,7 @@ Bitmap renderer for the aafigure package, using the Python Imaging Library.
 
 import sys
 from .error import UnsupportedFormatError
+from .shapes import Arc
 try:
     from PIL import Image, ImageDraw
 except ImportError:
@@ -23,6 +24,8 @@ class PILOutputVisitor:
     def __init__(self, options):
         self.options = options
         self.scale = options['scale'] * 8
+        # scale for the coordinates of the shapes, see visit_image
+        self.shape_scale = self.scale
         self.debug = options['debug']
         self.line_width = options['line_width']
         self.foreground = options['foreground']
@@ -32,14 +35,18 @@ class PILOutputVisitor:
     def _num(self, number):
         return number * self.scale
 
+    def _coordinate(self, number):
+        return number * self.shape_scale
+
     def visit_image(self, aa_image):
         """\
         Process the given ASCIIArtFigure and draw the shapes in
         the bitmap file
         """
         self.aa_image = aa_image        # save for later XXX not optimal to do it here
-        self.width = (aa_image.width + 1) * aa_image.nominal_size * aa_image.aspect_ratio
-        self.height = (aa_image.height + 1) * aa_image.nominal_size
+        width, height = aa_image.size()
+        self.width = (width + 1) * aa_image.nominal_size * aa_image.aspect_ratio
+        self.height = (height + 1) * aa_image.nominal_size
 
         # if font is given explicit, use it instead of proportional flag
         font_size = int(self._num(self.aa_image.nominal_size * 1.1))
@@ -56,6 +63,8 @@ class PILOutputVisitor:
             self.background
         )
         self.draw = ImageDraw.Draw(self.image)
+        # the coordinates of the shapes are in units of aa_image.unit
+        self.shape_scale = self.scale * aa_image.unit
 
         #~ if self.debug:
             #~ #draw a rectangle around entire image
@@ -91,17 +100,17 @@ class PILOutputVisitor:
     # - - - - - - drawing helpers - - - - - - -
     def _line(self, x1, y1, x2, y2):
         """Draw a line, coordinates given as four decimal numbers"""
-        self.draw.line((self._num(x1), self._num(y1),
-                        self._num(x2), self._num(y2)),
-                       fill=self.foreground)  # self.line_width
+        self.draw.line((self._coordinate(x1), self._coordinate(y1),
+                        self._coordinate(x2), self._coordinate(y2)),
+                       fill=self.foreground)
 
     def _rectangle(self, x1, y1, x2, y2):
         """\
         Draw a rectangle, coordinates given as four decimal numbers.
         ``style`` is inserted in the SVG. It could be e.g. "fill:yellow"
         """
-        self.draw.rectangle((self._num(x1), self._num(y1),
-                             self._num(x2), self._num(y2)),
+        self.draw.rectangle((self._coordinate(x1), self._coordinate(y1),
+                             self._coordinate(x2), self._coordinate(y2)),
                             fill=self.fillcolor,
                             outline=self.foreground)  # self.line_width
 
@@ -111,8 +120,8 @@ class PILOutputVisitor:
         dotsize = 2
         self.draw.ellipse(
             (
-                self._num(point.x) - dotsize, self._num(point.y) - dotsize,
-                self._num(point.x) + dotsize, self._num(point.y) + dotsize
+                self._coordinate(point.x) - dotsize, self._coordinate(point.y) - dotsize,
+                self._coordinate(point.x) + dotsize, self._coordinate(point.y) + dotsize
             ),
             fill=self.foreground
         )
@@ -122,17 +131,31 @@ class PILOutputVisitor:
         y1, y2 = line.start.y, line.end.y
         self._line(x1, y1, x2, y2)
 
+    def visit_polyline(self, polyline):
+        points = polyline.points
+        if polyline.closed:
+            points = points + points[:1]
+        self.draw.line([(self._coordinate(p.x), self._coordinate(p.y)) for p in points],
+                       fill=self.foreground)
+
     def visit_rectangle(self, rectangle):
-        self._rectangle(
-            rectangle.p1.x, rectangle.p1.y,
-            rectangle.p2.x, rectangle.p2.y,
-        )
+        if rectangle.filled:
+            self._rectangle(
+                rectangle.p1.x, rectangle.p1.y,
+                rectangle.p2.x, rectangle.p2.y,
+            )
+        else:
+            for shape in rectangle.outline():
+                if isinstance(shape, Arc):
+                    self.visit_arc(shape)
+                else:
+                    self.visit_line(shape)
 
     def visit_circle(self, circle):
         self.draw.ellipse(
             (
-                self._num(circle.center.x - circle.radius), self._num(circle.center.y - circle.radius),
-                self._num(circle.center.x + circle.radius), self._num(circle.center.y + circle.radius)
+                self._coordinate(circle.center.x - circle.radius), self._coordinate(circle.center.y - circle.radius),
+                self._coordinate(circle.center.x + circle.radius), self._coordinate(circle.center.y + circle.radius)
             ),
             fill=self.fillcolor,
             outline=self.foreground,
@@ -141,7 +164,7 @@ class PILOutputVisitor:
     def visit_label(self, label):
         #  font-weight="bold"
         self.draw.text(
-            (self._num(label.position.x), self._num(label.position.y - self.aa_image.nominal_size * 1.1)),
+            (self._coordinate(label.position.x), self._coordinate(label.position.y - self.aa_image.nominal_size * 1.1 / self.aa_image.unit)),
             label.text,
             fill=self.foreground,
             font=self.font
@@ -149,7 +172,7 @@ class PILOutputVisitor:
 
     def _bezier(self, p1, c1, c2, p2, level=1):
         # de Casteljau's algorithm
-        if self._num(p1.distance(p2)) <= 3:
+        if self._coordinate(p1.distance(p2)) <= 3:
             self._line(p1.x, p1.y, p2.x, p2.y)
         else:
             cmid = c1.midpoint(c2)
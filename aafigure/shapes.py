@@ -7,6 +7,7 @@
 #
 # This intentionally is no doc comment to make it easier to include the module
 # in Sphinx ``.. automodule::``
+from collections import namedtuple
 import math
 
 
@@ -17,12 +18,14 @@ def point(obj):
     - complex numbers are converted to Points
     - a tuple with two elements (x,y)
     """
-    if isinstance(obj, Point):
+    if type(obj) is Point:
         return obj
     if type(obj) is complex:
-        return Point(obj.real, obj.imag)
+        return tuple.__new__(Point, (obj.real, obj.imag))
     if type(obj) is tuple and len(obj) == 2:
-        return Point(obj[0], obj[1])
+        return tuple.__new__(Point, obj)
+    if isinstance(obj, Point):
+        return obj
     raise ValueError('can not convert {!r} to a Point'.format(obj))
 
 
@@ -34,18 +37,79 @@ def group(list_of_shapes):
         return list_of_shapes
 
 
-class Point:
+def _scaled(value, factor, convert):
+    """Helper for the ``scaled`` methods"""
+    value = value * factor
+    if convert is not None:
+        value = convert(value)
+    return value
+
+
+def _bounds(points):
+    """Helper for the ``bounding_box`` methods"""
+    xs = [p.x for p in points]
+    ys = [p.y for p in points]
+    return (min(xs), min(ys), max(xs), max(ys))
+
+
+class Shape(object):
+    """\
+    Base class for the shapes. The shapes are tuples with named fields
+    (see ``collections.namedtuple``), so they are small, immutable and
+    fast to create. They compare equal when they are of the same type and
+    have the same values, so that they can be used in sets and as
+    dictionary keys, e.g. to find duplicates.
+
+    The constructors convert the points with ``point()``, unless they
+    already are ``Point`` instances. Code that creates many shapes can skip
+    the constructor with ``tuple.__new__(Line, (start, end, thick))``,
+    all fields have to be given then.
+
+    All shapes have a ``scaled(scale_x, scale_y, convert=None)`` method,
+    that returns a copy with all coordinates multiplied by the factors and
+    then passed through ``convert`` (e.g. ``round``), if given. Radii of
+    circles are scaled with ``scale_y``, angles are not changed.
+    ``moved(dx, dy)`` returns a copy that is shifted by the given offsets.
+
+    ``bounding_box(character_width=2, character_height=2)`` returns the
+    smallest and largest coordinates as ``(x1, y1, x2, y2)``, or ``None``
+    for an empty group. The character size is used for the extent of
+    labels.
+    """
+    __slots__ = ()
+
+    def __eq__(self, other):
+        return type(other) is type(self) and tuple.__eq__(self, other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((self.__class__.__name__, tuple.__hash__(self)))
+
+
+class Point(Shape, namedtuple('Point', 'x y')):
     """\
     A single point. This class primary use is to represent coordinates
     for the other shapes.
     """
-    def __init__(self, x, y):
-        self.x = x
-        self.y = y
+    __slots__ = ()
+
+    def __new__(cls, x, y):
+        return tuple.__new__(cls, (x, y))
 
     def __repr__(self):
         return 'Point({p.x!r}, {p.y!r})'.format(p=self)
 
+    def scaled(self, scale_x, scale_y, convert=None):
+        return Point(_scaled(self.x, scale_x, convert), _scaled(self.y, scale_y, convert))
+
+    def moved(self, dx, dy):
+        return Point(self.x + dx, self.y + dy)
+
+    def bounding_box(self, character_width=2, character_height=2):
+        return (self.x, self.y, self.x, self.y)
+
     def distance(self, other):
         return math.sqrt((self.x - other.x) ** 2 +
                          (self.y - other.y) ** 2)
@@ -55,73 +119,226 @@ class Point:
                      (self.y + other.y) / 2)
 
 
-class Line:
+class Line(Shape, namedtuple('Line', 'start end thick')):
     """Line with starting and ending point. Both ends can have arrows"""
-    def __init__(self, start, end, thick=False):
-        self.thick = thick
-        self.start = point(start)
-        self.end = point(end)
+    __slots__ = ()
+
+    def __new__(cls, start, end, thick=False):
+        if type(start) is not Point:
+            start = point(start)
+        if type(end) is not Point:
+            end = point(end)
+        return tuple.__new__(cls, (start, end, thick))
 
     def __repr__(self):
         return 'Line({l.start!r}, {l.end!r})'.format(l=self)
 
+    def scaled(self, scale_x, scale_y, convert=None):
+        return Line(
+            self.start.scaled(scale_x, scale_y, convert),
+            self.end.scaled(scale_x, scale_y, convert),
+            self.thick)
 
-class Rectangle:
-    """Rectangle with two edge coordinates."""
-    def __init__(self, p1, p2):
-        self.p1 = point(p1)
-        self.p2 = point(p2)
+    def moved(self, dx, dy):
+        return Line(self.start.moved(dx, dy), self.end.moved(dx, dy), self.thick)
 
-    def __repr__(self):
-        return 'Rectangle({r.p1!r}, {r.p2!r})'.format(r=self)
+    def bounding_box(self, character_width=2, character_height=2):
+        return _bounds((self.start, self.end))
+
+
+class Rectangle(Shape, namedtuple('Rectangle', 'p1 p2 filled thick rx ry')):
+    """\
+    Rectangle with two edge coordinates. It is either filled or only the
+    outline is drawn, optionally with rounded corners (``rx`` and ``ry`` are
+    the horizontal and vertical radius).
+    """
+    __slots__ = ()
 
+    def __new__(cls, p1, p2, filled=True, thick=False, rx=0, ry=0):
+        if type(p1) is not Point:
+            p1 = point(p1)
+        if type(p2) is not Point:
+            p2 = point(p2)
+        return tuple.__new__(cls, (p1, p2, filled, thick, rx, ry))
 
-class Circle:
+    def __repr__(self):
+        if self.filled:
+            return 'Rectangle({r.p1!r}, {r.p2!r})'.format(r=self)
+        return 'Rectangle({r.p1!r}, {r.p2!r}, {r.filled!r}, {r.thick!r}, ' \
+               '{r.rx!r}, {r.ry!r})'.format(r=self)
+
+    def scaled(self, scale_x, scale_y, convert=None):
+        return Rectangle(
+            self.p1.scaled(scale_x, scale_y, convert),
+            self.p2.scaled(scale_x, scale_y, convert),
+            self.filled, self.thick,
+            _scaled(self.rx, scale_x, convert), _scaled(self.ry, scale_y, convert))
+
+    def moved(self, dx, dy):
+        return Rectangle(
+            self.p1.moved(dx, dy), self.p2.moved(dx, dy),
+            self.filled, self.thick, self.rx, self.ry)
+
+    def bounding_box(self, character_width=2, character_height=2):
+        return _bounds((self.p1, self.p2))
+
+    def outline(self):
+        """\
+        Return the outline as list of ``Line`` and ``Arc`` shapes. This is
+        useful for backends that can not draw rounded rectangles directly.
+        """
+        x1, x2 = sorted((self.p1.x, self.p2.x))
+        y1, y2 = sorted((self.p1.y, self.p2.y))
+        rx, ry = self.rx, self.ry
+        shapes = [
+            Line(Point(x1 + rx, y1), Point(x2 - rx, y1), self.thick),
+            Line(Point(x2, y1 + ry), Point(x2, y2 - ry), self.thick),
+            Line(Point(x2 - rx, y2), Point(x1 + rx, y2), self.thick),
+            Line(Point(x1, y2 - ry), Point(x1, y1 + ry), self.thick),
+        ]
+        if rx or ry:
+            shapes.extend([
+                Arc(Point(x1, y1 + ry), 90, Point(x1 + rx, y1), 180),
+                Arc(Point(x2, y1 + ry), 90, Point(x2 - rx, y1), 0),
+                Arc(Point(x2, y2 - ry), -90, Point(x2 - rx, y2), 0),
+                Arc(Point(x1, y2 - ry), -90, Point(x1 + rx, y2), 180),
+            ])
+        return shapes
+
+
+class Circle(Shape, namedtuple('Circle', 'center radius')):
     """Circle with center coordinates and radius."""
-    def __init__(self, center, radius):
-        self.center = point(center)
-        self.radius = radius
+    __slots__ = ()
+
+    def __new__(cls, center, radius):
+        if type(center) is not Point:
+            center = point(center)
+        return tuple.__new__(cls, (center, radius))
 
     def __repr__(self):
         return 'Circle({c.center!r}, {c.radius!r})'.format(c=self)
 
+    def scaled(self, scale_x, scale_y, convert=None):
+        return Circle(
+            self.center.scaled(scale_x, scale_y, convert),
+            _scaled(self.radius, scale_y, convert))
+
+    def moved(self, dx, dy):
+        return Circle(self.center.moved(dx, dy), self.radius)
+
+    def bounding_box(self, character_width=2, character_height=2):
+        x, y = self.center
+        return (x - self.radius, y - self.radius, x + self.radius, y + self.radius)
 
-class Label:
+
+class Label(Shape, namedtuple('Label', 'position text')):
     """A text label at a position"""
-    def __init__(self, position, text):
-        self.position = position
-        self.text = text
+    __slots__ = ()
+
+    def __new__(cls, position, text):
+        return tuple.__new__(cls, (position, text))
 
     def __repr__(self):
         return 'Label({t.position!r}, {t.text!r})'.format(t=self)
 
+    def scaled(self, scale_x, scale_y, convert=None):
+        return Label(self.position.scaled(scale_x, scale_y, convert), self.text)
+
+    def moved(self, dx, dy):
+        return Label(self.position.moved(dx, dy), self.text)
+
+    def bounding_box(self, character_width=2, character_height=2):
+        """The position is the lower left corner of the first character"""
+        x, y = self.position
+        return (x, y - character_height, x + len(self.text) * character_width, y)
+
+
+class Polyline(Shape, namedtuple('Polyline', 'points closed thick')):
+    """\
+    A line through a list of points. When it is closed, the last point is
+    connected to the first one, forming a polygon. The points are stored
+    as tuple.
+    """
+    __slots__ = ()
+
+    def __new__(cls, points, closed=False, thick=False):
+        return tuple.__new__(cls, (tuple([point(p) for p in points]), closed, thick))
 
-class Group:
-    """A group of shapes"""
-    def __init__(self, shapes=None):
+    def __repr__(self):
+        return 'Polyline({!r}, {p.closed!r}, {p.thick!r})'.format(list(self.points), p=self)
+
+    def scaled(self, scale_x, scale_y, convert=None):
+        return Polyline(
+            [p.scaled(scale_x, scale_y, convert) for p in self.points],
+            self.closed, self.thick)
+
+    def moved(self, dx, dy):
+        return Polyline([p.moved(dx, dy) for p in self.points], self.closed, self.thick)
+
+    def bounding_box(self, character_width=2, character_height=2):
+        return _bounds(self.points)
+
+
+class Group(Shape, namedtuple('Group', 'shapes')):
+    """A group of shapes. The shapes are stored as tuple."""
+    __slots__ = ()
+
+    def __new__(cls, shapes=None):
         if shapes is None:
-            shapes = []
-        self.shapes = shapes
+            shapes = ()
+        return tuple.__new__(cls, (tuple(shapes),))
 
     def __repr__(self):
-        return 'Group({!r})'.format(self.shapes)
+        return 'Group({!r})'.format(list(self.shapes))
+
+    def scaled(self, scale_x, scale_y, convert=None):
+        return Group([shape.scaled(scale_x, scale_y, convert) for shape in self.shapes])
+
+    def moved(self, dx, dy):
+        return Group([shape.moved(dx, dy) for shape in self.shapes])
 
+    def bounding_box(self, character_width=2, character_height=2):
+        boxes = [shape.bounding_box(character_width, character_height) for shape in self.shapes]
+        boxes = [box for box in boxes if box is not None]
+        if not boxes:
+            return None
+        return (min(box[0] for box in boxes), min(box[1] for box in boxes),
+                max(box[2] for box in boxes), max(box[3] for box in boxes))
 
-class Arc:
+
+class Arc(Shape, namedtuple('Arc', 'start start_angle end end_angle start_curve end_curve')):
     """A smooth arc between two points"""
-    def __init__(self, start, start_angle, end, end_angle, start_curve=True, end_curve=True):
-        self.start = point(start)
-        self.end = point(end)
-        self.start_angle = start_angle
-        self.end_angle = end_angle
-        self.start_curve = start_curve
-        self.end_curve = end_curve
+    __slots__ = ()
+
+    def __new__(cls, start, start_angle, end, end_angle, start_curve=True, end_curve=True):
+        if type(start) is not Point:
+            start = point(start)
+        if type(end) is not Point:
+            end = point(end)
+        return tuple.__new__(cls, (start, start_angle, end, end_angle, start_curve, end_curve))
 
     def __repr__(self):
         return 'Arc({a.start!r}, {a.start_angle!r}, ' \
                '{a.end!r}, {a.end_angle!r}, {a.start_curve!r}, ' \
                '{a.end_curve!r})'.format(a=self)
 
+    def scaled(self, scale_x, scale_y, convert=None):
+        return Arc(
+            self.start.scaled(scale_x, scale_y, convert), self.start_angle,
+            self.end.scaled(scale_x, scale_y, convert), self.end_angle,
+            self.start_curve, self.end_curve)
+
+    def moved(self, dx, dy):
+        return Arc(
+            self.start.moved(dx, dy), self.start_angle,
+            self.end.moved(dx, dy), self.end_angle,
+            self.start_curve, self.end_curve)
+
+    def bounding_box(self, character_width=2, character_height=2):
+        """The curve is always inside the box of its control points"""
+        return _bounds((self.start, self.start_control_point(),
+                        self.end_control_point(), self.end))
+
     def start_angle_rad(self):
         return self.start_angle * math.pi / 180
 
@@ -0,0 +1,343 @@
+#!python
+#
+# This file is part of aafigure. https://github.com/aafigure/aafigure
+# (C) 2009 Chris Liechti <cliechti@gmx.net>
+#
+# SPDX-License-Identifier:    BSD-3-Clause
+"""\
+Post processing of recognized shapes for the aafigure package.
+
+The functions here take a list of shapes (as found in
+``AsciiArtImage.shapes``) and return a new list that draws the same image
+with fewer shapes.
+"""
+
+import bisect
+from .shapes import Line, Polyline, Rectangle, Label, Group
+
+
+def merge_rectangles(shapes):
+    """\
+    Combine filled rectangles that touch each other into larger ones. Groups
+    are processed recursively, rectangles are never combined across groups
+    (each fill region is a group). First,
+    rectangles of the same height that are side by side in a row are
+    merged, then rows of the same width that are on top of each other.
+    Only rectangles with the same attributes are combined, outlined
+    rectangles (e.g. boxes) are kept as they are. The combined rectangles
+    are placed where the first rectangle was in the list.
+    """
+    result = []
+    # lists of rectangles, by attributes (in the order they were found)
+    rectangles = {}
+    kinds = []
+    position = None
+    for shape in shapes:
+        if isinstance(shape, Rectangle) and shape.filled:
+            if position is None:
+                position = len(result)
+            kind = (shape.thick, shape.rx, shape.ry)
+            if kind not in rectangles:
+                rectangles[kind] = []
+                kinds.append(kind)
+            rectangles[kind].append((
+                min(shape.p1.y, shape.p2.y), max(shape.p1.y, shape.p2.y),
+                min(shape.p1.x, shape.p2.x), max(shape.p1.x, shape.p2.x)))
+        elif isinstance(shape, Group):
+            result.append(Group(merge_rectangles(shape.shapes)))
+        else:
+            result.append(shape)
+    merged = []
+    for thick, rx, ry in kinds:
+        merged.extend(
+            Rectangle((x1, y1), (x2, y2), True, thick, rx, ry)
+            for y1, y2, x1, x2 in _merge_cells(rectangles[thick, rx, ry]))
+    if merged:
+        result[position:position] = merged
+    return result
+
+
+def _merge_cells(rectangles):
+    """\
+    Helper for merge_rectangles: combine a list of tuples
+    ``(y1, y2, x1, x2)``, first side by side, then on top of each other.
+    """
+    # merge horizontally: sorted by row, then left edge
+    rectangles.sort()
+    rows = []
+    for y1, y2, x1, x2 in rectangles:
+        if rows and rows[-1][0] == y1 and rows[-1][1] == y2 and rows[-1][3] == x1:
+            rows[-1][3] = x2
+        else:
+            rows.append([y1, y2, x1, x2])
+    # merge vertically: sorted by left and right edge, then row
+    rows.sort(key=lambda row: (row[2], row[3], row[0]))
+    merged = []
+    for y1, y2, x1, x2 in rows:
+        if merged and merged[-1][2] == x1 and merged[-1][3] == x2 and merged[-1][1] == y1:
+            merged[-1][1] = y2
+        else:
+            merged.append([y1, y2, x1, x2])
+    return merged
+
+
+def merge_lines(shapes):
+    """\
+    Connect lines that share end points into polylines. Lines are taken out
+    of their groups (e.g. a line and its arrow head) and joined with all
+    others of the same thickness. A chain continues straight through
+    crossings where possible. Points in the middle of straight segments
+    are removed. The polylines are placed where the first line was in the
+    list, groups that are left empty are removed.
+    """
+    lines = []
+    result = _extract_lines(shapes, lines)
+    position = result.index(None) if None in result else len(result)
+    result = [shape for shape in result if shape is not None]
+    joined = []
+    for thick in (False, True):
+        joined.extend(_join(
+            [line for line in lines if bool(line.thick) == thick], thick))
+    result[position:position] = joined
+    return result
+
+
+def _extract_lines(shapes, lines):
+    """\
+    Helper for merge_lines: move all non degenerate lines to the ``lines``
+    list. The returned list has a ``None`` where the first line was.
+    """
+    result = []
+    for shape in shapes:
+        if isinstance(shape, Line) and _key(shape.start) != _key(shape.end):
+            if not lines:
+                result.append(None)
+            lines.append(shape)
+        elif isinstance(shape, Group):
+            found = bool(lines)
+            children = _extract_lines(shape.shapes, lines)
+            if None in children:
+                children.remove(None)
+                if not found:
+                    result.append(None)
+            if children:
+                result.append(Group(children))
+        else:
+            result.append(shape)
+    return result
+
+
+def _key(point):
+    """Coordinates of a point, rounded so that they can be compared"""
+    return (round(point.x, 6), round(point.y, 6))
+
+
+def _join(lines, thick):
+    """Helper for merge_lines: build the graph and walk it"""
+    points = {}
+    neighbors = {}
+    for number, line in enumerate(lines):
+        start = _key(line.start)
+        end = _key(line.end)
+        points.setdefault(start, line.start)
+        points.setdefault(end, line.end)
+        neighbors.setdefault(start, []).append((number, end))
+        neighbors.setdefault(end, []).append((number, start))
+    used = set()
+
+    def walk(vertex):
+        path = [vertex]
+        previous = None
+        while True:
+            candidates = [(number, other) for number, other in neighbors[vertex] if number not in used]
+            if not candidates:
+                break
+            if previous is None or len(neighbors[vertex]) == 2:
+                number, other = candidates[0]
+            else:
+                # at a crossing, only continue in the same direction
+                straight = [(number, other) for number, other in candidates
+                            if _collinear(previous, vertex, other)]
+                if not straight:
+                    break
+                number, other = straight[0]
+            used.add(number)
+            previous, vertex = vertex, other
+            path.append(vertex)
+            if vertex == path[0]:
+                break
+        return path
+
+    paths = []
+    # start at ends and crossings, then walk the remaining loops
+    for vertex in sorted(neighbors):
+        if len(neighbors[vertex]) != 2:
+            while any(number not in used for number, other in neighbors[vertex]):
+                paths.append(walk(vertex))
+    for vertex in sorted(neighbors):
+        while any(number not in used for number, other in neighbors[vertex]):
+            paths.append(walk(vertex))
+
+    result = []
+    for path in paths:
+        closed = len(path) > 3 and path[0] == path[-1]
+        if closed:
+            del path[-1]
+            path = [vertex for n, vertex in enumerate(path)
+                    if not _collinear(path[n - 1], vertex, path[(n + 1) % len(path)])]
+        else:
+            path = path[:1] + [path[n] for n in range(1, len(path) - 1)
+                               if not _collinear(path[n - 1], path[n], path[n + 1])] + path[-1:]
+        if len(path) == 2 and not closed:
+            result.append(Line(points[path[0]], points[path[1]], thick))
+        else:
+            result.append(Polyline([points[vertex] for vertex in path], closed, thick))
+    return result
+
+
+def _collinear(previous, vertex, following):
+    """\
+    Check if ``vertex`` is on the straight segment from ``previous`` to
+    ``following`` (the direction does not change).
+    """
+    dx1 = vertex[0] - previous[0]
+    dy1 = vertex[1] - previous[1]
+    dx2 = following[0] - vertex[0]
+    dy2 = following[1] - vertex[1]
+    return abs(dx1 * dy2 - dy1 * dx2) < 1e-6 and dx1 * dx2 + dy1 * dy2 > 0
+
+
+def remove_overlaps(shapes, statistics=None):
+    """\
+    Remove shapes that are drawn more than once and lines that are
+    completely covered by other lines on the same straight line with the
+    same thickness (e.g. the shared border of two fill regions) or by the
+    sides of an outlined ``Rectangle``. Groups
+    that are left empty are removed. When a dictionary is passed as
+    ``statistics``, the number of removed shapes is added to the entries
+    ``'duplicates'`` and ``'covered'``.
+    """
+    seen = set()
+    removed = set()
+    lines = {}
+    _find_duplicates(shapes, seen, removed, lines)
+    duplicates = len(removed)
+    for segments in lines.values():
+        # rectangle sides first, then the longest lines, shorter lines are
+        # removed if the lines kept so far cover them
+        segments.sort(key=lambda segment: (segment[2] is not None, segment[0] - segment[1]))
+        covered = []
+        for start, end, path in segments:
+            if path is not None and _covers(covered, start, end):
+                removed.add(path)
+            else:
+                _add_range(covered, start, end)
+    if statistics is not None:
+        statistics['duplicates'] = statistics.get('duplicates', 0) + duplicates
+        statistics['covered'] = statistics.get('covered', 0) + len(removed) - duplicates
+    return _without(shapes, removed)
+
+
+def _find_duplicates(shapes, seen, removed, lines, path=()):
+    """\
+    Helper for remove_overlaps: mark duplicates as removed and sort the
+    other lines into ``lines``, a dictionary of lists of segments, one per
+    straight line and thickness. Shapes are identified by their path, the
+    tuple of indices in the list and the groups, so that the same object
+    can occur more than once.
+    """
+    for index, shape in enumerate(shapes):
+        if isinstance(shape, Group):
+            _find_duplicates(shape.shapes, seen, removed, lines, path + (index,))
+            continue
+        if isinstance(shape, Line):
+            start, end = sorted((_key(shape.start), _key(shape.end)))
+            key = (Line, start, end, bool(shape.thick))
+        else:
+            key = shape
+        if key in seen:
+            removed.add(path + (index,))
+            continue
+        seen.add(key)
+        if isinstance(shape, Line):
+            _add_segment(lines, start, end, shape.thick, path + (index,))
+        elif isinstance(shape, Rectangle) and not shape.filled:
+            for side in shape.outline():
+                if isinstance(side, Line):
+                    start, end = sorted((_key(side.start), _key(side.end)))
+                    _add_segment(lines, start, end, shape.thick, None)
+
+
+def _add_segment(lines, start, end, thick, path):
+    """\
+    Helper for remove_overlaps: sort a segment into ``lines``. ``path`` is
+    the path of the shape that is removed if the segment is covered, or
+    ``None`` if the segment can only cover others.
+    """
+    if start == end:
+        return
+    # direction, normalized so that lines in both directions match
+    dx = end[0] - start[0]
+    dy = end[1] - start[1]
+    length = (dx * dx + dy * dy) ** 0.5
+    dx /= length
+    dy /= length
+    # the distance from the origin identifies the straight line, the
+    # position along it is the dot product with the direction
+    offset = round(start[0] * dy - start[1] * dx, 6)
+    position_start = start[0] * dx + start[1] * dy
+    position_end = end[0] * dx + end[1] * dy
+    lines.setdefault((round(dx, 6), round(dy, 6), offset, bool(thick)), []).append(
+        (position_start, position_end, path))
+
+
+def _covers(ranges, start, end):
+    """Check if the sorted, disjoint ``ranges`` cover start...end"""
+    index = bisect.bisect_right(ranges, (start + 1e-6,)) - 1
+    return index >= 0 and ranges[index][0] <= start + 1e-6 and ranges[index][1] >= end - 1e-6
+
+
+def _add_range(ranges, start, end):
+    """Add start...end to the sorted, disjoint ``ranges``, joining overlaps"""
+    index = bisect.bisect_left(ranges, (start,))
+    # join with the range before, if it touches
+    if index > 0 and ranges[index - 1][1] >= start - 1e-6:
+        index -= 1
+        start = ranges[index][0]
+    last = index
+    while last < len(ranges) and ranges[last][0] <= end + 1e-6:
+        end = max(end, ranges[last][1])
+        last += 1
+    ranges[index:last] = [(start, end)]
+
+
+def _without(shapes, removed, path=()):
+    """\
+    Helper for remove_overlaps: copy the tree without the shapes with the
+    paths in ``removed``
+    """
+    result = []
+    for index, shape in enumerate(shapes):
+        if isinstance(shape, Group):
+            children = _without(shape.shapes, removed, path + (index,))
+            if children:
+                result.append(Group(children))
+        elif path + (index,) not in removed:
+            result.append(shape)
+    return result
+
+
+def without_labels(shapes):
+    """\
+    Return the shapes without labels, e.g. for images that are too small
+    to read the text anyway. Groups that become empty are removed.
+    """
+    result = []
+    for shape in shapes:
+        if isinstance(shape, Group):
+            children = without_labels(shape.shapes)
+            if children:
+                result.append(Group(children))
+        elif not isinstance(shape, Label):
+            result.append(shape)
+    return result
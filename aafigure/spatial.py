@@ -0,0 +1,78 @@
+#!python
+#
+# This file is part of aafigure. https://github.com/aafigure/aafigure
+# (C) 2009 Chris Liechti <cliechti@gmx.net>
+#
+# SPDX-License-Identifier:    BSD-3-Clause
+"""\
+Spatial index for shapes.
+
+The drawing area is divided in a uniform grid of cells, each cell has a list
+of the shapes whose bounding box touches it. Searching for the shapes in a
+region then only needs to look at the cells that the region covers.
+"""
+
+
+class SpatialIndex:
+    """\
+    Index of a list of shapes by their bounding boxes. The shapes of the
+    list are indexed as a whole, i.e. a group is found when any of its
+    children is in the searched region. ``cell_width`` and ``cell_height``
+    are the size of a grid cell, the character size is needed for the
+    extent of labels. All sizes are in the units of the shape coordinates.
+    """
+
+    def __init__(self, shapes, cell_width, cell_height, character_width=2, character_height=2):
+        self.shapes = list(shapes)
+        self.cell_width = cell_width
+        self.cell_height = cell_height
+        self.boxes = []
+        self.cells = {}
+        for number, shape in enumerate(self.shapes):
+            box = shape.bounding_box(character_width, character_height)
+            self.boxes.append(box)
+            if box is None:
+                continue
+            for cell in self._cells(box):
+                self.cells.setdefault(cell, []).append(number)
+
+    def _cells(self, box):
+        """Iterate over the grid cells that a box touches"""
+        x1, y1, x2, y2 = box
+        for column in range(int(x1 // self.cell_width), int(x2 // self.cell_width) + 1):
+            for row in range(int(y1 // self.cell_height), int(y2 // self.cell_height) + 1):
+                yield column, row
+
+    def bounding_box(self):
+        """The box around all shapes or ``None`` if there are none"""
+        boxes = [box for box in self.boxes if box is not None]
+        if not boxes:
+            return None
+        return (min(box[0] for box in boxes), min(box[1] for box in boxes),
+                max(box[2] for box in boxes), max(box[3] for box in boxes))
+
+    def search(self, x1, y1, x2, y2):
+        """\
+        Return the shapes whose bounding box overlaps or touches the given
+        region, in the same order as in the indexed list.
+        """
+        x1, x2 = sorted((x1, x2))
+        y1, y2 = sorted((y1, y2))
+        cells = self.cells
+        columns = int(x2 // self.cell_width) - int(x1 // self.cell_width) + 1
+        rows = int(y2 // self.cell_height) - int(y1 // self.cell_height) + 1
+        if columns * rows > len(cells):
+            # large regions: checking all boxes is faster than the cells
+            found = [number for number, box in enumerate(self.boxes) if box is not None]
+        else:
+            found = set()
+            for cell in self._cells((x1, y1, x2, y2)):
+                found.update(cells.get(cell, ()))
+        boxes = self.boxes
+        return [self.shapes[number] for number in sorted(found)
+                if boxes[number][0] <= x2 and boxes[number][2] >= x1
+                and boxes[number][1] <= y2 and boxes[number][3] >= y1]
+
+    def hit(self, x, y, tolerance=0):
+        """Return the shapes whose bounding box is near the given point"""
+        return self.search(x - tolerance, y - tolerance, x + tolerance, y + tolerance)
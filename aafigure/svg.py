@@ -20,6 +20,8 @@ class SVGOutputVisitor:
         self.options = options
         self.file_like = codecs.getwriter('utf-8')(options['file_like'])
         self.scale = options['scale'] * 7
+        # scale for the coordinates of the shapes, see visit_image
+        self.shape_scale = self.scale
         self.line_width = options['line_width']
         self.foreground = options['foreground']
         self.background = options['background']
@@ -39,9 +41,13 @@ class SVGOutputVisitor:
         """helper to scale numbers for svg output"""
         return number * self.scale
 
+    def _size(self, number):
+        """helper to scale sizes of shapes for svg output"""
+        return number * self.shape_scale
+
     def _coordinate(self, number):
-        """helper to scale numbers for svg output"""
-        return self._num(number) + self.border
+        """helper to scale coordinates of shapes for svg output"""
+        return self._size(number) + self.border
 
     def get_size_attrs(self):
         """get image size as svg text"""
@@ -57,8 +63,11 @@ class SVGOutputVisitor:
         the SVG file
         """
         self.aa_image = aa_image        # save for later XXX not optimal to do it here
-        self.width = aa_image.width * aa_image.nominal_size * aa_image.aspect_ratio
-        self.height = aa_image.height * aa_image.nominal_size
+        width, height = aa_image.size()
+        self.width = width * aa_image.nominal_size * aa_image.aspect_ratio
+        self.height = height * aa_image.nominal_size
+        # the coordinates of the shapes are in units of aa_image.unit
+        self.shape_scale = self.scale * aa_image.unit
         if xml_header:
             self.file_like.write(
                 u'<?xml version="1.0" standalone="no"?>\n'
@@ -115,7 +124,7 @@ class SVGOutputVisitor:
             'fill="{}" stroke-width="{}" style="{}" />'.format(
                 self.indent,
                 self._coordinate(x1), self._coordinate(y1),
-                self._num(x2 - x1), self._num(y2 - y1),
+                self._size(x2 - x1), self._size(y2 - y1),
                 self.fillcolor,  # stroke:%s;
                 self.fillcolor,
                 self.line_width,
@@ -138,10 +147,34 @@ class SVGOutputVisitor:
         y1, y2 = line.start.y, line.end.y
         self._line(x1, y1, x2, y2, line.thick)
 
+    def visit_polyline(self, polyline):
+        self.file_like.write(
+            u'{}<{} points="{}" fill="none" stroke="{}" '
+            'stroke-width="{}" />\n'.format(
+                self.indent,
+                u'polygon' if polyline.closed else u'polyline',
+                u' '.join(u'{},{}'.format(self._coordinate(p.x), self._coordinate(p.y))
+                          for p in polyline.points),
+                self.foreground,
+                self.line_width * (1 + bool(polyline.thick))))
+
     def visit_rectangle(self, rectangle):
-        self._rectangle(
-            rectangle.p1.x, rectangle.p1.y,
-            rectangle.p2.x, rectangle.p2.y)
+        if rectangle.filled:
+            self._rectangle(
+                rectangle.p1.x, rectangle.p1.y,
+                rectangle.p2.x, rectangle.p2.y)
+        else:
+            x1, x2 = sorted((rectangle.p1.x, rectangle.p2.x))
+            y1, y2 = sorted((rectangle.p1.y, rectangle.p2.y))
+            self.file_like.write(
+                u'{}<rect x="{}" y="{}" width="{}" height="{}" rx="{}" ry="{}" '
+                'fill="none" stroke="{}" stroke-width="{}" />\n'.format(
+                    self.indent,
+                    self._coordinate(x1), self._coordinate(y1),
+                    self._size(x2 - x1), self._size(y2 - y1),
+                    self._size(rectangle.rx), self._size(rectangle.ry),
+                    self.foreground,
+                    self.line_width * (1 + bool(rectangle.thick))))
 
     def visit_circle(self, circle):
         self.file_like.write(
@@ -149,7 +182,7 @@ class SVGOutputVisitor:
             'fill="{}" />'.format(
                 self.indent,
                 self._coordinate(circle.center.x), self._coordinate(circle.center.y),
-                self._num(circle.radius),
+                self._size(circle.radius),
                 self.foreground,
                 self.line_width,
                 self.fillcolor))
@@ -160,7 +193,7 @@ class SVGOutputVisitor:
             u'{}<text x="{}" y="{}" font-family="{}" font-size="{}" '
             'fill="{}" >\n  {}\n{}</text>\n'.format(
                 self.indent,
-                self._coordinate(label.position.x), self._coordinate(label.position.y - 0.3),  # XXX static offset not good in all situations
+                self._coordinate(label.position.x), self._coordinate(label.position.y - 0.3 / self.aa_image.unit),  # XXX static offset not good in all situations
                 self.font,
                 self._num(self.aa_image.nominal_size),
                 self.foreground,
@@ -0,0 +1,297 @@
+#!python
+#
+# This file is part of aafigure. https://github.com/aafigure/aafigure
+# (C) 2009 Chris Liechti <cliechti@gmx.net>
+#
+# SPDX-License-Identifier:    BSD-3-Clause
+"""\
+Export of a list of shapes to columns.
+
+A ``ShapeTable`` stores the coordinates and flags of all shapes of one kind
+in typed arrays (``array.array``). It is made from a list of shapes with
+``ShapeTable.from_shapes(shapes)``, e.g. from ``AsciiArtImage.shapes``
+after ``recognize()``, and ``to_shapes()`` converts it back. The
+recognizer and the output visitors work with the shape objects only.
+
+The arrays can be processed with other tools (e.g. wrapped with
+``numpy.frombuffer``) and the table pickles to the raw bytes of the
+arrays. The ``processes`` option uses it to return the shapes from the
+worker processes.
+"""
+
+from array import array
+from .shapes import Point, Line, Rectangle, Circle, Label, Arc, Polyline, Group
+
+# kinds, as used in the ``kinds`` column
+KIND_POINT = 0
+KIND_LINE = 1
+KIND_RECTANGLE = 2
+KIND_CIRCLE = 3
+KIND_LABEL = 4
+KIND_ARC = 5
+KIND_POLYLINE = 6
+KIND_GROUP = 7
+KIND_OTHER = 8
+
+# flag bits
+FLAG_THICK = 1
+FLAG_FILLED = 2
+FLAG_CLOSED = 4
+FLAG_START_CURVE = 8
+FLAG_END_CURVE = 16
+
+
+class ShapeTable:
+    """\
+    Shapes, stored in columns. Each kind of shape has its own arrays, the
+    number of a shape within its kind is its row. Coordinates are stored
+    as consecutive values (e.g. ``x1, y1, x2, y2`` for a line) in arrays
+    of doubles.
+
+    ``kinds`` and ``rows`` list all shapes in drawing order (groups before
+    their children). Groups are numbered starting at 1, ``group_parent``
+    and ``group_size`` have the enclosing group and the number of direct
+    children of each group. All other kinds have a ``*_group`` column with
+    the number of the group they are in (0 for the top level).
+    """
+
+    def __init__(self):
+        self.kinds = array('b')
+        self.rows = array('i')
+        self.point_xy = array('d')
+        self.point_group = array('i')
+        self.line_xy = array('d')
+        self.line_flags = array('b')
+        self.line_group = array('i')
+        self.rectangle_xy = array('d')
+        self.rectangle_radius = array('d')
+        self.rectangle_flags = array('b')
+        self.rectangle_group = array('i')
+        self.circle_xyr = array('d')
+        self.circle_group = array('i')
+        # label texts are stored in one string, label_offsets has the
+        # start and end index of each label
+        self.label_xy = array('d')
+        self.label_offsets = array('i')
+        self.label_group = array('i')
+        self.text = ''
+        self.arc_xy = array('d')
+        self.arc_angles = array('d')
+        self.arc_flags = array('b')
+        self.arc_group = array('i')
+        # points of all polylines, polyline_offsets has the start and end
+        # index (in points) of each polyline
+        self.polyline_xy = array('d')
+        self.polyline_offsets = array('i')
+        self.polyline_flags = array('b')
+        self.polyline_group = array('i')
+        self.group_parent = array('i')
+        self.group_size = array('i')
+        # shapes of unknown types are kept as they are
+        self.others = []
+        self.other_group = array('i')
+
+    def _columns(self):
+        """All arrays, sorted by name"""
+        return [value for name, value in sorted(vars(self).items()) if isinstance(value, array)]
+
+    def __getstate__(self):
+        # each pickled array has some overhead, the raw bytes are more compact
+        # (Python 2 calls the methods tostring and fromstring)
+        return (self.text, self.others,
+                [(getattr(column, 'tobytes', None) or column.tostring)() for column in self._columns()])
+
+    def __setstate__(self, state):
+        self.__init__()
+        self.text, self.others, data = state
+        for column, raw in zip(self._columns(), data):
+            (getattr(column, 'frombytes', None) or column.fromstring)(raw)
+
+    def __len__(self):
+        """Number of shapes, including groups"""
+        return len(self.kinds)
+
+    def count(self, kind):
+        """Number of shapes of the given kind"""
+        return self.kinds.count(kind)
+
+    @classmethod
+    def from_shapes(cls, shapes):
+        """Create a table from a list of shapes"""
+        table = cls()
+        texts = []
+        table._add(shapes, 0, texts)
+        table.text = ''.join(texts)
+        return table
+
+    def _add(self, shapes, group, texts):
+        """Helper for from_shapes: append shapes to the columns"""
+        kinds = self.kinds
+        rows = self.rows
+        for shape in shapes:
+            kind = type(shape)
+            if kind is Line:
+                kinds.append(KIND_LINE)
+                rows.append(len(self.line_flags))
+                self.line_xy.extend((shape.start.x, shape.start.y, shape.end.x, shape.end.y))
+                self.line_flags.append(FLAG_THICK if shape.thick else 0)
+                self.line_group.append(group)
+            elif kind is Group:
+                kinds.append(KIND_GROUP)
+                rows.append(len(self.group_parent))
+                self.group_parent.append(group)
+                self.group_size.append(len(shape.shapes))
+                self._add(shape.shapes, len(self.group_parent), texts)
+            elif kind is Label:
+                kinds.append(KIND_LABEL)
+                rows.append(len(self.label_group))
+                self.label_xy.extend((shape.position.x, shape.position.y))
+                start = self.label_offsets[-1] if self.label_offsets else 0
+                self.label_offsets.extend((start, start + len(shape.text)))
+                texts.append(shape.text)
+                self.label_group.append(group)
+            elif kind is Rectangle:
+                kinds.append(KIND_RECTANGLE)
+                rows.append(len(self.rectangle_flags))
+                self.rectangle_xy.extend((shape.p1.x, shape.p1.y, shape.p2.x, shape.p2.y))
+                self.rectangle_radius.extend((shape.rx, shape.ry))
+                self.rectangle_flags.append(
+                    (FLAG_THICK if shape.thick else 0) | (FLAG_FILLED if shape.filled else 0))
+                self.rectangle_group.append(group)
+            elif kind is Circle:
+                kinds.append(KIND_CIRCLE)
+                rows.append(len(self.circle_group))
+                self.circle_xyr.extend((shape.center.x, shape.center.y, shape.radius))
+                self.circle_group.append(group)
+            elif kind is Arc:
+                kinds.append(KIND_ARC)
+                rows.append(len(self.arc_flags))
+                self.arc_xy.extend((shape.start.x, shape.start.y, shape.end.x, shape.end.y))
+                self.arc_angles.extend((shape.start_angle, shape.end_angle))
+                self.arc_flags.append(
+                    (FLAG_START_CURVE if shape.start_curve else 0) |
+                    (FLAG_END_CURVE if shape.end_curve else 0))
+                self.arc_group.append(group)
+            elif kind is Polyline:
+                kinds.append(KIND_POLYLINE)
+                rows.append(len(self.polyline_flags))
+                start = len(self.polyline_xy) // 2
+                for p in shape.points:
+                    self.polyline_xy.extend((p.x, p.y))
+                self.polyline_offsets.extend((start, start + len(shape.points)))
+                self.polyline_flags.append(
+                    (FLAG_THICK if shape.thick else 0) | (FLAG_CLOSED if shape.closed else 0))
+                self.polyline_group.append(group)
+            elif kind is Point:
+                kinds.append(KIND_POINT)
+                rows.append(len(self.point_group))
+                self.point_xy.extend((shape.x, shape.y))
+                self.point_group.append(group)
+            else:
+                kinds.append(KIND_OTHER)
+                rows.append(len(self.others))
+                self.others.append(shape)
+                self.other_group.append(group)
+
+    def shape(self, kind, row, convert=None):
+        """\
+        Create the shape object for one row (groups are empty). ``convert``
+        is applied to coordinates and sizes, e.g. ``int`` for tables of
+        integer coordinates.
+        """
+        if convert is None:
+            values = list
+        else:
+            def values(column):
+                return [convert(value) for value in column]
+        if kind == KIND_LINE:
+            x1, y1, x2, y2 = values(self.line_xy[4 * row:4 * row + 4])
+            return Line(Point(x1, y1), Point(x2, y2), bool(self.line_flags[row] & FLAG_THICK))
+        elif kind == KIND_LABEL:
+            start, end = self.label_offsets[2 * row:2 * row + 2]
+            return Label(Point(*values(self.label_xy[2 * row:2 * row + 2])), self.text[start:end])
+        elif kind == KIND_RECTANGLE:
+            x1, y1, x2, y2 = values(self.rectangle_xy[4 * row:4 * row + 4])
+            rx, ry = values(self.rectangle_radius[2 * row:2 * row + 2])
+            flags = self.rectangle_flags[row]
+            return Rectangle(
+                Point(x1, y1), Point(x2, y2),
+                bool(flags & FLAG_FILLED), bool(flags & FLAG_THICK), rx, ry)
+        elif kind == KIND_CIRCLE:
+            x, y, radius = values(self.circle_xyr[3 * row:3 * row + 3])
+            return Circle(Point(x, y), radius)
+        elif kind == KIND_ARC:
+            x1, y1, x2, y2 = values(self.arc_xy[4 * row:4 * row + 4])
+            a1, a2 = self.arc_angles[2 * row:2 * row + 2]
+            flags = self.arc_flags[row]
+            return Arc(
+                Point(x1, y1), a1, Point(x2, y2), a2,
+                bool(flags & FLAG_START_CURVE), bool(flags & FLAG_END_CURVE))
+        elif kind == KIND_POLYLINE:
+            start, end = self.polyline_offsets[2 * row:2 * row + 2]
+            xy = values(self.polyline_xy[2 * start:2 * end])
+            flags = self.polyline_flags[row]
+            return Polyline(
+                [Point(xy[n], xy[n + 1]) for n in range(0, len(xy), 2)],
+                bool(flags & FLAG_CLOSED), bool(flags & FLAG_THICK))
+        elif kind == KIND_POINT:
+            return Point(*values(self.point_xy[2 * row:2 * row + 2]))
+        elif kind == KIND_GROUP:
+            return Group()
+        else:
+            return self.others[row]
+
+    def to_shapes(self, convert=None):
+        """\
+        Convert the table back to a list of shapes. ``convert`` is applied
+        to coordinates and sizes (see ``shape``).
+        """
+        result = []
+        # stack of (list of the enclosing group, number of missing children)
+        stack = []
+        current = result
+        missing = -1
+        # lines are the most common shapes, they are created directly from
+        # the values, which are known to be of the right types
+        new = tuple.__new__
+        line_xy = self.line_xy
+        line_flags = self.line_flags
+        for kind, row in zip(self.kinds, self.rows):
+            if kind == KIND_LINE and convert is None:
+                x1, y1, x2, y2 = line_xy[4 * row:4 * row + 4]
+                current.append(new(Line, (
+                    new(Point, (x1, y1)), new(Point, (x2, y2)),
+                    bool(line_flags[row] & FLAG_THICK))))
+                missing -= 1
+            elif kind == KIND_GROUP:
+                stack.append((current, missing - 1))
+                current = []
+                missing = self.group_size[row]
+            else:
+                current.append(self.shape(kind, row, convert))
+                missing -= 1
+            while missing == 0:
+                children = current
+                current, missing = stack.pop()
+                current.append(Group(children))
+        return result
+
+    def transform(self, scale_x=1, scale_y=1, offset_x=0, offset_y=0):
+        """\
+        Scale and move all coordinates in place. Radii of circles are scaled
+        with ``scale_y``, angles are not changed (as ``Shape.scaled``).
+        """
+        for column in (self.point_xy, self.line_xy, self.rectangle_xy,
+                       self.label_xy, self.arc_xy, self.polyline_xy):
+            for n in range(0, len(column), 2):
+                column[n] = column[n] * scale_x + offset_x
+                column[n + 1] = column[n + 1] * scale_y + offset_y
+        xyr = self.circle_xyr
+        for n in range(0, len(xyr), 3):
+            xyr[n] = xyr[n] * scale_x + offset_x
+            xyr[n + 1] = xyr[n + 1] * scale_y + offset_y
+            xyr[n + 2] = xyr[n + 2] * scale_y
+        radius = self.rectangle_radius
+        for n in range(0, len(radius), 2):
+            radius[n] = radius[n] * scale_x
+            radius[n + 1] = radius[n + 1] * scale_y
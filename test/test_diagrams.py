@@ -64,11 +64,39 @@ class TestDiagrams(unittest.TestCase):
         visitor, output = aafigure.render(ascii_art, options={'format': 'png'})
         self.assertTrue(b'PNG' in output.getvalue())
 
+    @unittest.skipUnless(pil_available, 'requires PIL or Pillow')
+    def test_render_merged_lines_pil(self):
+        from PIL import Image
+        pixels = []
+        for merge_lines in (False, True):
+            visitor, output = aafigure.render(u'---+\n   |\n   +===', options={
+                'format': 'png',
+                'merge_lines': merge_lines})
+            pixels.append(Image.open(BytesIO(output.getvalue())).tobytes())
+        self.assertEqual(pixels[0], pixels[1])
+
     @unittest.skipUnless(reportlab_available, 'requires reportlab')
     def test_render_api_pdf(self):
         visitor, output = aafigure.render(ascii_art, options={'format': 'pdf'})
         self.assertTrue(b'%PDF' in output.getvalue())
 
+    def test_render_merged_shapes(self):
+        visitor, output = aafigure.render(u'XXX\nX X\nXXX', options={
+            'format': 'svg',
+            'merge_rectangles': True,
+            'merge_borders': True})
+        self.assertEqual(output.getvalue().count(b'<polygon'), 2)
+        self.assertEqual(output.getvalue().count(b'<rect'), 4)
+
+    def test_render_fixed_point(self):
+        text = u'+--->\n|  *\n+-----  "a"\n   XX /-\\'
+        for aspect in (1, 0.5, 1.5):
+            visitor, output = aafigure.render(text, options={
+                'format': 'svg', 'aspect_ratio': aspect})
+            visitor, fixed = aafigure.render(text, options={
+                'format': 'svg', 'aspect_ratio': aspect, 'fixed_point': True})
+            self.assertEqual(fixed.getvalue(), output.getvalue())
+
     def test_process_api(self):
         output = BytesIO()
         visitor = aafigure.process(
@@ -0,0 +1,512 @@
+#!/usr/bin/env python
+#
+# This file is part of aafigure. https://github.com/aafigure/aafigure
+# (C) 2017 Chris Liechti <cliechti@gmx.net>
+#
+# SPDX-License-Identifier:    BSD-3-Clause
+"""
+Test the recognition of shapes in AsciiArtImage.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import unittest
+from aafigure import aafigure
+from aafigure.aafigure import AsciiArtImage, recognize_lines, CLASS_LINE, CLASS_OUTSIDE, CLASS_RECTANGLE, CLASS_STRING
+from aafigure.shapes import Arc, Circle, Label, Line, Point, Polyline, Rectangle
+from aafigure.table import ShapeTable
+
+
+class TestGrid(unittest.TestCase):
+
+    def test_get_out_of_bounds(self):
+        aaimg = AsciiArtImage(u'ab\nc')
+        self.assertEqual(aaimg.width, 2)
+        self.assertEqual(aaimg.height, 2)
+        self.assertEqual(aaimg.get(1, 0), 'b')
+        self.assertEqual(aaimg.get(1, 1), ' ')
+        for x, y in ((-1, 0), (2, 0), (0, -1), (0, 2), (100, 100), (-5, -5)):
+            self.assertEqual(aaimg.get(x, y), ' ')
+        self.assertEqual(str(aaimg), u'ab\nc ')
+
+    def test_wide_glyphs(self):
+        aaimg = AsciiArtImage(u'a\u4e2db\n\u00b0--')
+        self.assertEqual(aaimg.width, 4)
+        self.assertEqual(aaimg.row(0), u'a\u4e2d b')
+        aaimg = AsciiArtImage(u'a\u4e2db\n\u00b0--', {'widechars': 'A'})
+        self.assertEqual(aaimg.width, 4)
+        self.assertEqual(aaimg.row(1), u'\u00b0 --')
+        aaimg = AsciiArtImage(u'ab', {'widechars': 'Na'})
+        self.assertEqual(aaimg.row(0), u'a b ')
+        aaimg = AsciiArtImage(u'\u4e2d\u6587 --> \u00b0C')
+        aaimg.recognize()
+        self.assertEqual([label.text for label in aaimg.shapes if isinstance(label, Label)],
+                         [u'\u4e2d \u6587', u'\u00b0C'])
+
+    def test_occupancy_index(self):
+        aaimg = AsciiArtImage(u'a  "b"\n\n' + u' ' * 500 + u'c')
+        self.assertEqual([aaimg._chars[i] for i in aaimg._occupied], ['a', '"', 'b', '"', 'c'])
+        aaimg.recognize()
+        self.assertEqual([label.text for label in aaimg.shapes], ['b', 'a', 'c'])
+
+    def test_tag_and_cls(self):
+        aaimg = AsciiArtImage(u'--\n--')
+        self.assertIsNone(aaimg.cls(0, 0))
+        aaimg.tag([(0, 0), (1, 1)], CLASS_LINE)
+        self.assertEqual(aaimg.cls(0, 0), CLASS_LINE)
+        self.assertEqual(aaimg.cls(1, 1), CLASS_LINE)
+        self.assertIsNone(aaimg.cls(1, 0))
+        for x, y in ((-1, 0), (2, 0), (0, -1), (0, 2), (100, 100)):
+            self.assertEqual(aaimg.cls(x, y), CLASS_OUTSIDE)
+
+
+class TestLines(unittest.TestCase):
+
+    def test_follow_line_run_table(self):
+        aaimg = AsciiArtImage(u'  +-----> \n  |\n  |\n  V')
+        self.assertEqual(aaimg._follow_line(4, 0, dx=1, line_character='-')[:2], (8, 0))
+        self.assertEqual(aaimg._follow_line(4, 0, dx=-1, line_character='-')[:2], (3, 0))
+        self.assertEqual(aaimg._follow_line(2, 1, dy=1, line_character='|')[:2], (2, 3))
+        self.assertEqual(aaimg._follow_line(2, 2, dy=-1, line_character='|')[:2], (2, 1))
+
+    def test_long_line(self):
+        aaimg = AsciiArtImage(u'<' + u'=' * 1000 + u'>')
+        aaimg.recognize()
+        self.assertEqual(len(aaimg.shapes), 1)
+        line = aaimg.shapes[0].shapes[-1]
+        self.assertTrue(line.thick)
+        self.assertEqual(line.start.x, aaimg.left(0))
+        self.assertEqual(line.end.x, aaimg.right(1001))
+
+
+class TestFills(unittest.TestCase):
+
+    def test_fill_with_border(self):
+        aaimg = AsciiArtImage(u'XX\nXX')
+        aaimg.recognize()
+        shapes = aaimg.shapes[0].shapes
+        self.assertEqual(len([shape for shape in shapes if isinstance(shape, Rectangle)]), 4)
+        self.assertEqual(len([shape for shape in shapes if isinstance(shape, Line)]), 8)
+
+    def test_fill_spans(self):
+        aaimg = AsciiArtImage(u'a a a\naaaaa\n a  a\n    a')
+        aaimg.recognize()
+        self.assertEqual(len(aaimg.shapes), 1)
+        # all cells are used, lower case fills have no border
+        self.assertEqual(len(aaimg.shapes[0].shapes), 11 * 2)
+        for y in range(aaimg.height):
+            for x in range(aaimg.width):
+                if aaimg.get(x, y) == 'a':
+                    self.assertEqual(aaimg.cls(x, y), CLASS_RECTANGLE)
+
+    def test_merge_hatches(self):
+        for character, count in (('a', 6), ('c', 12), ('k', 3), ('j', 4), ('n', 6)):
+            aaimg = AsciiArtImage((character * 4 + u'\n') * 3, {'merge_hatches': True})
+            aaimg.recognize()
+            self.assertEqual(len(aaimg.shapes[0].shapes), count)
+        aaimg = AsciiArtImage(u'aaaa\naaaa\n', {'merge_hatches': True})
+        aaimg.recognize()
+        diagonal = aaimg.shapes[0].shapes[1]
+        self.assertEqual((diagonal.start.x, diagonal.start.y), (aaimg.left(0), aaimg.top(0)))
+        self.assertEqual((diagonal.end.x, diagonal.end.y), (aaimg.left(2), aaimg.top(2)))
+
+    def test_merge_borders(self):
+        aaimg = AsciiArtImage(u'XXX\nX X\nXX ', {'merge_borders': True})
+        aaimg.recognize()
+        outlines = [shape for shape in aaimg.shapes[0].shapes if isinstance(shape, Polyline)]
+        self.assertEqual(len(outlines), 2)
+        self.assertTrue(all(outline.closed for outline in outlines))
+        self.assertEqual(len(outlines[0].points), 6)
+        self.assertEqual(len(outlines[1].points), 4)
+        self.assertFalse([shape for shape in aaimg.shapes[0].shapes if isinstance(shape, Line)])
+
+
+class TestRoundedEdges(unittest.TestCase):
+
+    def test_corners(self):
+        aaimg = AsciiArtImage(u'/-\\\n| |\n\\-/')
+        aaimg.recognize()
+        arcs = [shape for shape in aaimg.shapes if isinstance(shape, Arc)]
+        self.assertEqual(len(arcs), 4)
+
+    def test_diagonal(self):
+        for rounded in (False, True):
+            aaimg = AsciiArtImage(u'-\\\n  -', {'rounded': rounded})
+            aaimg.recognize()
+            self.assertEqual(
+                [type(shape) for shape in aaimg.shapes],
+                [Line, Arc if rounded else Line, Line])
+
+    def test_diagonal_aspect(self):
+        # the start of the diagonal is at the vertical center of the line
+        aaimg = AsciiArtImage(u'-\n \\', {'aspect_ratio': 0.5})
+        aaimg.recognize()
+        diagonal = aaimg.shapes[1]
+        self.assertEqual(diagonal.start.y, aaimg.vcenter(0))
+        self.assertEqual(diagonal.start.x, aaimg.left(1))
+        self.assertEqual(diagonal.end.y, aaimg.bottom(1))
+
+
+class TestBoxes(unittest.TestCase):
+
+    def recognize(self, text):
+        aaimg = AsciiArtImage(text, {'boxes': True})
+        aaimg.recognize()
+        return aaimg.shapes
+
+    def test_box(self):
+        shapes = self.recognize(u'+---+\n|box+--->\n+---+')
+        box = shapes[0]
+        self.assertTrue(isinstance(box, Rectangle))
+        self.assertFalse(box.filled)
+        self.assertEqual((box.p1.x, box.p1.y, box.p2.x, box.p2.y), (1, 1, 9, 5))
+        self.assertEqual((box.rx, box.ry), (0, 0))
+        # the arrow is still attached to the '+' on the side
+        self.assertEqual(len([shape for shape in shapes if isinstance(shape, Rectangle)]), 1)
+        self.assertEqual(shapes[-1].text, 'box')
+
+    def test_rounded_and_thick(self):
+        shapes = self.recognize(u'/--\\ +==+\n|  | |  |\n\\--/ +==+')
+        self.assertEqual(len(shapes), 2)
+        self.assertEqual((shapes[0].rx, shapes[0].ry), (1, 1))
+        self.assertFalse(shapes[0].thick)
+        self.assertTrue(shapes[1].thick)
+
+    def test_shared_sides(self):
+        shapes = self.recognize(u'+--+--+\n|  |  |\n+--+--+\n|     |\n+-----+')
+        self.assertEqual(
+            [(box.p1.x, box.p1.y, box.p2.x, box.p2.y) for box in shapes],
+            [(1, 1, 7, 5), (7, 1, 13, 5), (1, 5, 13, 9)])
+
+    def test_plus_on_sides(self):
+        # the '+' on the right side are not joined over the outline
+        shapes = self.recognize(u'+---+\n|   +--\n+---+')
+        self.assertEqual(shapes, [
+            Rectangle(Point(1, 1), Point(9, 5), filled=False),
+            Line(Point(9, 3), Point(14, 3))])
+        # but to other '+' outside of the box
+        shapes = self.recognize(u'+---++\n|   |\n+---+')
+        self.assertEqual(shapes[1:], [Line(Point(9, 1), Point(11, 1))])
+
+    def test_open(self):
+        shapes = self.recognize(u'+---+\n|   |\n+-- +')
+        self.assertFalse(any(isinstance(shape, Rectangle) for shape in shapes))
+
+    def test_outline(self):
+        box = Rectangle((0, 0), (4, 2), filled=False, rx=1, ry=1)
+        outline = box.outline()
+        self.assertEqual(len([shape for shape in outline if isinstance(shape, Line)]), 4)
+        self.assertEqual(len([shape for shape in outline if isinstance(shape, Arc)]), 4)
+
+
+class TestFixedPoint(unittest.TestCase):
+
+    def test_integer_coordinates(self):
+        text = u'+--->\n|  *\n+-----'
+        for aspect in (1, 0.5):
+            aaimg = AsciiArtImage(text, {'aspect_ratio': aspect})
+            aaimg.recognize()
+            fixed = AsciiArtImage(text, {'aspect_ratio': aspect, 'fixed_point': True})
+            fixed.recognize()
+            line = fixed.shapes[3]
+            # horizontal units are scaled with the aspect ratio
+            self.assertEqual(line, Line(Point(int(30 * aspect), 150), Point(int(360 * aspect), 150)))
+            self.assertTrue(isinstance(line.start.x, int))
+            for shape, reference in zip(fixed.drawing_shapes(), aaimg.shapes):
+                self.assertEqual(type(shape), type(reference))
+            self.assertAlmostEqual(fixed.drawing_shapes()[3].end.x, aaimg.shapes[3].end.x)
+
+    def test_exact_hatches(self):
+        # the triple hatches are at multiples of 1/3 and 1/12 cell
+        for fill in 'GP':
+            aaimg = AsciiArtImage(fill * 4)
+            aaimg.recognize()
+            fixed = AsciiArtImage(fill * 4, {'fixed_point': True})
+            fixed.recognize()
+            for line, reference in zip(fixed.drawing_shapes()[0].shapes, aaimg.shapes[0].shapes):
+                for value, expected in zip(line.start + line.end, reference.start + reference.end):
+                    self.assertAlmostEqual(value, expected, places=9)
+        aaimg = AsciiArtImage(u'*', {'fixed_point': True})
+        aaimg.recognize()
+        self.assertEqual(aaimg.shapes[0], Circle(Point(30, 30), 30))
+
+
+    def test_scaled(self):
+        circle = Circle(Point(1.26, 2), 0.5).scaled(10, 20, round)
+        self.assertEqual(circle, Circle(Point(13, 40), 10))
+
+
+class TestViewport(unittest.TestCase):
+
+    def test_window(self):
+        text = u'\n'.join([u'+--+ -->  "a" /\\  ' * 10] * 3 * 30)
+        aaimg = AsciiArtImage(text)
+        aaimg.recognize()
+        # shift the full image to the window position
+        table = ShapeTable.from_shapes(aaimg.shapes)
+        table.transform(offset_x=-2 * 23, offset_y=-2 * 31)
+        window = AsciiArtImage(text, {'viewport': (23, 31, 20, 10)})
+        window.recognize()
+        self.assertEqual(window.size(), (20, 10))
+        self.assertTrue(window.width < 30 and window.height < 20)
+        for shape in table.to_shapes():
+            x1, y1, x2, y2 = shape.bounding_box()
+            if x1 >= 0 and y1 >= 0 and x2 <= 40 and y2 <= 20:
+                self.assertTrue(shape in window.shapes, shape)
+        for shape in window.shapes:
+            x1, y1, x2, y2 = shape.bounding_box()
+            self.assertTrue(x1 <= 40 and y1 <= 20 and x2 >= 0 and y2 >= 0, shape)
+
+    def test_border(self):
+        # lines crossing the border are drawn to the outside
+        aaimg = AsciiArtImage(u'---------->', {'viewport': (5, 0, 2, 1)})
+        aaimg.recognize()
+        line = aaimg.shapes[0].shapes[-1]
+        self.assertEqual(line, Line(Point(-8, 1), Point(12, 1)))
+
+
+class TestLevelOfDetail(unittest.TestCase):
+
+    def recognize(self, text, options):
+        aaimg = AsciiArtImage(text, options)
+        aaimg.recognize()
+        return aaimg.shapes
+
+    def test_hatches(self):
+        text = u'GGGG\nGGGG\nGGGG'
+        self.assertEqual(
+            self.recognize(text, {'level_of_detail': 8}),
+            self.recognize(text.replace('G', 'D'), {'merge_hatches': True}))
+        # one rectangle and the border
+        self.assertEqual(len(self.recognize(text, {'level_of_detail': 3})[0].shapes), 15)
+        # below the sparsest hatch, the fill is solid
+        self.assertEqual(
+            self.recognize(text, {'level_of_detail': 3}),
+            self.recognize(text.replace('G', 'X'), {'merge_rectangles': True}))
+        # large cells are drawn in full detail
+        self.assertEqual(
+            self.recognize(text, {'level_of_detail': 16}),
+            self.recognize(text, {'merge_hatches': True}))
+
+    def test_labels(self):
+        text = u'+--+ abc\nUUUU'
+        self.assertEqual(len(self.recognize(text, {'level_of_detail': 6})), 3)
+        # no text and only the border of the dotted fill
+        shapes = self.recognize(text, {'level_of_detail': 5})
+        self.assertEqual(len(shapes), 2)
+        self.assertTrue(all(isinstance(shape, Line) for shape in shapes[1].shapes))
+
+
+class TestLabels(unittest.TestCase):
+
+    TEXT = u'+--+  Box\n|  |\n+--+-->o "a -- b"\n XXX\n XXX  vX\n   ^--+  {Q}'
+
+    def test_same_texts(self):
+        aaimg = AsciiArtImage(self.TEXT)
+        aaimg.recognize()
+        labels = AsciiArtImage(self.TEXT).labels()
+        self.assertEqual(labels, [
+            (6, 0, 'Box'), (7, 2, 'o'), (9, 2, 'a -- b'), (6, 4, 'vX'), (3, 5, '^'), (10, 5, 'Q')])
+        self.assertEqual(
+            sorted(text for x, y, text in labels),
+            sorted(shape.text for shape in aaimg.shapes if isinstance(shape, Label)))
+
+    def test_units(self):
+        labels = AsciiArtImage(self.TEXT).labels()
+        for options in ({'aspect_ratio': 0.5}, {'fixed_point': True}):
+            self.assertEqual(AsciiArtImage(self.TEXT, options).labels(), labels)
+
+    def test_custom_shape(self):
+        class Image(AsciiArtImage):
+            pass
+        Image.register_shape('Q', lambda image, x, y: image.tag([(x, y)], CLASS_RECTANGLE) or [])
+        # the function is called, the claims are only used for the built-in shapes
+        self.assertEqual(Image(self.TEXT).labels()[-1], (3, 5, '^'))
+
+
+class TestPhases(unittest.TestCase):
+
+    TEXT = u'"a"  +--+\n-->  |  |\n     +--+ b'
+
+    def test_all_phases(self):
+        aaimg = AsciiArtImage(self.TEXT)
+        aaimg.recognize()
+        phases = list(AsciiArtImage(self.TEXT).recognize_phases())
+        self.assertEqual([name for name, shapes in phases], ['quoted_strings', 'shapes', 'strings'])
+        self.assertEqual([shape for name, shapes in phases for shape in shapes], aaimg.shapes)
+        phases = list(AsciiArtImage(self.TEXT, {'boxes': True}).recognize_phases())
+        self.assertEqual([name for name, shapes in phases], ['quoted_strings', 'boxes', 'shapes', 'strings'])
+        self.assertEqual(len(phases[1][1]), 1)
+
+    def test_stop_early(self):
+        aaimg = AsciiArtImage(self.TEXT)
+        for name, shapes in aaimg.recognize_phases():
+            self.assertEqual([shape.text for shape in shapes], ['a'])
+            break
+        self.assertEqual(aaimg.cls(0, 0), CLASS_STRING)
+        self.assertIsNone(aaimg.cls(0, 1))
+
+    def test_skip(self):
+        aaimg = AsciiArtImage(self.TEXT)
+        phases = list(aaimg.recognize_phases(['quoted_strings', 'strings']))
+        self.assertEqual(
+            [shape.text for shape in phases[1][1]],
+            ['+--+', '-->', '|', '|', '+--+ b'])
+        self.assertRaises(ValueError, list, aaimg.recognize_phases(['fills']))
+
+
+class TestStreaming(unittest.TestCase):
+
+    def test_same_shapes(self):
+        text = u'+--+\n|  |  "x"\n+--+\n\n --> XX\n  |  XX\n  v\n\n\n  /--\\\n  \\--/'
+        aaimg = AsciiArtImage(text)
+        aaimg.recognize()
+        streamed = list(recognize_lines(line + '\n' for line in text.splitlines()))
+        self.assertEqual(sorted(streamed, key=repr), sorted(aaimg.shapes, key=repr))
+
+    def test_lazy(self):
+        consumed = []
+
+        def lines():
+            for y in range(1000):
+                consumed.append(y)
+                yield [u'+--+', u'|  |', u'+--+', u''][y % 4]
+
+        shapes = recognize_lines(lines())
+        first = next(shapes)
+        self.assertTrue(len(consumed) < 10)
+        aaimg = AsciiArtImage(u'+--+\n|  |\n+--+')
+        aaimg.recognize()
+        self.assertTrue(first in aaimg.shapes)
+        self.assertEqual(len(list(shapes)) + 1, 250 * len(aaimg.shapes))
+
+
+class TestUpdate(unittest.TestCase):
+
+    TEXT = u'+--+\n|  |  "x"\n+--+\n\n --> XX\n  |  XX\n  v\n\n  ___\n  abc'
+
+    def check(self, start, end, lines):
+        aaimg = AsciiArtImage(self.TEXT)
+        aaimg.recognize()
+        old = list(aaimg.shapes)
+        shapes, added, removed = aaimg.update(start, end, lines)
+        rows = self.TEXT.splitlines()
+        rows[start:end] = lines
+        reference = AsciiArtImage(u'\n'.join(rows))
+        reference.recognize()
+        self.assertEqual(sorted(shapes, key=repr), sorted(reference.shapes, key=repr))
+        self.assertEqual(str(aaimg), str(reference))
+        self.assertEqual(aaimg.size(), reference.size())
+        for shape in removed:
+            old.remove(shape)
+        self.assertEqual(sorted(old + added, key=repr), sorted(shapes, key=repr))
+        return added, removed
+
+    def test_change(self):
+        added, removed = self.check(5, 6, [u'  |  XX  -->'])
+        # only the band with the arrow is recognized again
+        self.assertEqual(len(removed), 3)
+        self.assertEqual(len(added), 4)
+
+    def test_insert_and_delete(self):
+        self.check(3, 3, [u'', u'  --'])
+        self.check(3, 4, [])
+        self.check(7, 8, [u'  |'])
+        self.check(0, 10, [u'x'])
+
+    def test_trailing_spaces(self):
+        # the rows that are not changed keep their trailing spaces
+        aaimg = AsciiArtImage(u'-->    \n  |')
+        aaimg.recognize()
+        aaimg.update(1, 2, [u'  v'])
+        self.assertEqual(aaimg.size(), (7, 2))
+        self.assertEqual(str(aaimg), u'-->    \n  v    ')
+
+
+class TestParallel(unittest.TestCase):
+
+    TEXT = u'+--+ abc\n|  |\n+--+ "a  b" x\n\n  -->  XX  y z\n  |    XX\n  v ---'
+
+    def setUp(self):
+        # split even the small test images
+        self.minimum = aafigure.PARALLEL_MIN_SIZE
+        aafigure.PARALLEL_MIN_SIZE = 0
+
+    def tearDown(self):
+        aafigure.PARALLEL_MIN_SIZE = self.minimum
+
+    def test_components(self):
+        rows = self.TEXT.splitlines()
+        components = aafigure._components(rows)
+        self.assertEqual(components, [
+            [(0, 0, 8), (1, 0, 1), (1, 3, 4), (2, 0, 13)],
+            [(4, 2, 5), (4, 7, 9), (5, 2, 3), (5, 7, 9), (6, 2, 7)],
+            [(4, 11, 14)],
+        ])
+        self.assertEqual(len(aafigure._partition(components, 2)), 2)
+
+    def test_same_shapes(self):
+        aaimg = AsciiArtImage(self.TEXT)
+        aaimg.recognize()
+        parallel = AsciiArtImage(self.TEXT, {'processes': 2, 'fixed_point': True})
+        parallel.recognize()
+        self.assertEqual(
+            sorted(parallel.drawing_shapes(), key=repr),
+            sorted(aaimg.shapes, key=repr))
+        self.assertTrue(isinstance(parallel.shapes[0].position.x, int))
+        self.assertEqual(parallel.cls(2, 4), CLASS_LINE)
+
+    def test_same_classes(self):
+        # an unterminated quote tags the rest of the row, behind its part
+        text = u'x "a\n\n----------'
+        aaimg = AsciiArtImage(text)
+        aaimg.recognize()
+        parallel = AsciiArtImage(text, {'processes': 2})
+        parallel.recognize()
+        self.assertEqual(parallel.cls(8, 0), CLASS_STRING)
+        self.assertEqual(parallel._classes, aaimg._classes)
+
+
+class TestRegistry(unittest.TestCase):
+
+    def test_register_fixed_character(self):
+        class MyImage(AsciiArtImage):
+            pass
+
+        def draw_dot(image, x, y):
+            return [Circle(Point(image.hcenter(x), image.vcenter(y)), 0.3)]
+
+        MyImage.register_fixed_character('@', draw_dot)
+        aaimg = MyImage(u'@')
+        aaimg.recognize()
+        self.assertEqual(len(aaimg.shapes), 1)
+        self.assertEqual(aaimg.shapes[0].radius, 0.3)
+        # the base class is not changed
+        aaimg = AsciiArtImage(u'@')
+        aaimg.recognize()
+        self.assertEqual(aaimg.shapes[0].text, '@')
+
+    def test_register_arrow(self):
+        class MyImage(AsciiArtImage):
+            pass
+
+        MyImage.register_arrow('*', 1, 0, '_circle_head')
+        aaimg = MyImage(u'--*')
+        aaimg.recognize()
+        self.assertTrue(isinstance(aaimg.shapes[0].shapes[0], Circle))
+        self.assertRaises(ValueError, aaimg.get_fill, '*')
+
+    def test_bound_once(self):
+        aaimg = AsciiArtImage(u'-->')
+        self.assertIs(aaimg.get_arrow('>', 1, 0), aaimg.get_arrow('>', 1, 0))
+        self.assertIs(aaimg.get_fill('X'), aaimg.get_fill('X'))
+        self.assertIs(aaimg.get_fixed_character('*'), aaimg.get_fixed_character('*'))
+        self.assertIs(aaimg.get_fill('X').__self__, aaimg)
+
+
+if __name__ == '__main__':
+    sys.stdout.write(__doc__)
+    # When this module is executed from the command-line, it runs all its tests
+    unittest.main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+#
+# This file is part of aafigure. https://github.com/aafigure/aafigure
+# (C) 2017 Chris Liechti <cliechti@gmx.net>
+#
+# SPDX-License-Identifier:    BSD-3-Clause
+"""
+Test the shape classes.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import pickle
+import unittest
+from aafigure.shapes import Arc, Circle, Group, Label, Line, Point, Polyline, Rectangle
+
+
+class TestShapes(unittest.TestCase):
+
+    def test_point_conversion(self):
+        self.assertEqual(Line(1 + 2j, (3, 4)), Line(Point(1, 2), Point(3, 4)))
+        self.assertRaises(ValueError, Line, 'a', (3, 4))
+
+    def test_equality_and_hash(self):
+        shapes = [
+            Line((0, 0), (1, 1)),
+            Line((0, 0), (1, 1)),
+            Line((0, 0), (1, 1), thick=True),
+            Rectangle((0, 0), (1, 1)),
+            Circle((0, 0), 1),
+            Circle((0, 0), 1),
+            Label(Point(0, 0), 'a'),
+            Arc((0, 0), 90, (1, 1), 0),
+            Polyline([(0, 0), (1, 1)]),
+            Polyline([(0, 0), (1, 1)]),
+            Group([Line((0, 0), (1, 1))]),
+        ]
+        self.assertEqual(len(set(shapes)), 8)
+        # same values, different types
+        self.assertNotEqual(Point(0, 0), (0, 0))
+        self.assertNotEqual(Label(Point(0, 0), 1), Circle(Point(0, 0), 1))
+        # None is accepted for an empty group
+        self.assertEqual(Group(None), Group([]))
+
+    def test_immutable(self):
+        line = Line((0, 0), (1, 1))
+        self.assertRaises(AttributeError, setattr, line, 'thick', True)
+        self.assertRaises(AttributeError, setattr, line.start, 'x', 5)
+        self.assertRaises(AttributeError, setattr, line, 'color', 'red')
+
+    def test_pickle(self):
+        shape = Group([Line((0, 0), (1, 1)), Polyline([(0, 0), (1, 1)], True)])
+        self.assertEqual(pickle.loads(pickle.dumps(shape)), shape)
+
+    def test_bounding_box(self):
+        self.assertEqual(Line((3, 4), (1, 2)).bounding_box(), (1, 2, 3, 4))
+        self.assertEqual(Circle((1, 1), 2).bounding_box(), (-1, -1, 3, 3))
+        self.assertEqual(Label(Point(2, 4), 'abc').bounding_box(), (2, 2, 8, 4))
+        self.assertEqual(Label(Point(2, 4), 'abc').bounding_box(1, 3), (2, 1, 5, 4))
+        self.assertEqual(Polyline([(0, 5), (1, 1), (4, 2)]).bounding_box(), (0, 1, 4, 5))
+        self.assertEqual(
+            Group([Rectangle((5, 5), (6, 6)), Group(), Point(-1, 2)]).bounding_box(),
+            (-1, 2, 6, 6))
+        self.assertIsNone(Group().bounding_box())
+        # the curve bulges out between the end points
+        x1, y1, x2, y2 = Arc((0, 0), 90, (3, 0), 90).bounding_box()
+        self.assertEqual((x1, y1, x2, y2), (0, -1, 3, 0))
+
+    def test_moved(self):
+        self.assertEqual(Line((1, 2), (3, 4), True).moved(1, -2), Line((2, 0), (4, 2), True))
+        self.assertEqual(
+            Group([Circle((0, 0), 1), Label(Point(1, 1), 'a')]).moved(2, 3),
+            Group([Circle((2, 3), 1), Label(Point(3, 4), 'a')]))
+
+    def test_repr(self):
+        self.assertEqual(
+            repr(Group([Line((0, 0), (1, 1))])),
+            'Group([Line(Point(0, 0), Point(1, 1))])')
+
+
+if __name__ == '__main__':
+    sys.stdout.write(__doc__)
+    # When this module is executed from the command-line, it runs all its tests
+    unittest.main()
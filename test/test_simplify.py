@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+#
+# This file is part of aafigure. https://github.com/aafigure/aafigure
+# (C) 2017 Chris Liechti <cliechti@gmx.net>
+#
+# SPDX-License-Identifier:    BSD-3-Clause
+"""
+Test the post processing of recognized shapes.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import unittest
+from aafigure.aafigure import AsciiArtImage
+from aafigure.shapes import Circle, Group, Line, Point, Polyline, Rectangle
+from aafigure import simplify
+
+
+def flatten(shapes):
+    for shape in shapes:
+        if isinstance(shape, Group):
+            for child in flatten(shape.shapes):
+                yield child
+        else:
+            yield shape
+
+
+def area(rectangles):
+    return sum(abs(r.p2.x - r.p1.x) * abs(r.p2.y - r.p1.y) for r in rectangles)
+
+
+class TestMergeRectangles(unittest.TestCase):
+
+    def test_block(self):
+        aaimg = AsciiArtImage(u'xxxxxx\n' * 4, {'merge_rectangles': True})
+        aaimg.recognize()
+        rectangles = list(flatten(aaimg.shapes))
+        self.assertEqual(len(rectangles), 1)
+        self.assertEqual(area(rectangles), 24 * aaimg.nominal_size ** 2)
+
+    def test_irregular(self):
+        text = u'XXXX\nXXXX\n XX\n XXXXX'
+        aaimg = AsciiArtImage(text)
+        aaimg.recognize()
+        cells = [shape for shape in flatten(aaimg.shapes) if isinstance(shape, Rectangle)]
+        merged = simplify.merge_rectangles(aaimg.shapes)
+        rectangles = [shape for shape in flatten(merged) if isinstance(shape, Rectangle)]
+        self.assertEqual(len(rectangles), 3)
+        self.assertEqual(area(rectangles), area(cells))
+        # the border is not changed
+        self.assertEqual(
+            len([shape for shape in flatten(merged) if isinstance(shape, Line)]),
+            len([shape for shape in flatten(aaimg.shapes) if isinstance(shape, Line)]))
+
+    def test_separate_groups(self):
+        shapes = [Group([Rectangle((0, 0), (1, 1))]), Group([Rectangle((1, 0), (2, 1))])]
+        merged = simplify.merge_rectangles(shapes)
+        self.assertEqual(len(merged), 2)
+        self.assertEqual(len(merged[0].shapes), 1)
+
+
+    def test_boxes(self):
+        # outlined boxes are not fill cells
+        aaimg = AsciiArtImage(u'+--+--+\n|  |  |\n+--+--+', {'boxes': True, 'merge_rectangles': True})
+        aaimg.recognize()
+        boxes = [shape for shape in flatten(aaimg.shapes) if isinstance(shape, Rectangle)]
+        self.assertEqual(len(boxes), 2)
+        self.assertFalse(boxes[0].filled or boxes[1].filled)
+        rounded = Rectangle((0, 0), (1, 1), rx=0.5, ry=0.5)
+        merged = simplify.merge_rectangles([rounded, Rectangle((1, 0), (2, 1)), Rectangle((2, 0), (3, 1))])
+        self.assertEqual(merged, [rounded, Rectangle((1, 0), (3, 1))])
+
+
+class TestMergeLines(unittest.TestCase):
+
+    def test_box(self):
+        aaimg = AsciiArtImage(u'+---+\n|   |\n+---+', {'merge_lines': True})
+        aaimg.recognize()
+        shapes = list(flatten(aaimg.shapes))
+        self.assertEqual(len(shapes), 1)
+        self.assertTrue(isinstance(shapes[0], Polyline))
+        self.assertTrue(shapes[0].closed)
+        self.assertEqual(len(shapes[0].points), 4)
+
+    def test_chain(self):
+        shapes = [
+            Line(Point(0, 0), Point(1, 0)),
+            Group([Line(Point(2, 0), Point(1, 0)), Rectangle((5, 5), (6, 6))]),
+            Line(Point(2, 0), Point(2, 3)),
+        ]
+        merged = simplify.merge_lines(shapes)
+        self.assertEqual(len(merged), 2)
+        self.assertEqual(
+            [(point.x, point.y) for point in merged[0].points],
+            [(0, 0), (2, 0), (2, 3)])
+        self.assertFalse(merged[0].closed)
+        self.assertTrue(isinstance(merged[1].shapes[0], Rectangle))
+
+    def test_crossing(self):
+        shapes = [
+            Line(Point(0, 1), Point(1, 1)),
+            Line(Point(1, 1), Point(2, 1)),
+            Line(Point(1, 0), Point(1, 1)),
+            Line(Point(1, 1), Point(1, 2)),
+        ]
+        merged = simplify.merge_lines(shapes)
+        # straight through the crossing, no corners
+        self.assertEqual(len(merged), 2)
+        self.assertTrue(all(isinstance(shape, Line) for shape in merged))
+
+    def test_thickness(self):
+        shapes = [
+            Line(Point(0, 0), Point(1, 0)),
+            Line(Point(1, 0), Point(2, 0), thick=True),
+        ]
+        merged = simplify.merge_lines(shapes)
+        self.assertEqual(len(merged), 2)
+        self.assertEqual(sorted(bool(line.thick) for line in merged), [False, True])
+
+
+class TestRemoveOverlaps(unittest.TestCase):
+
+    def test_covered(self):
+        shapes = [
+            Line(Point(1, 0), Point(2, 0)),
+            Group([Line(Point(4, 0), Point(0, 0)), Circle(Point(0, 0), 1)]),
+            Line(Point(3, 0), Point(5, 0)),
+            Line(Point(1, 0), Point(2, 0), thick=True),
+            Group([Line(Point(2, 0), Point(1, 0))]),
+            Circle(Point(0, 0), 1),
+        ]
+        statistics = {}
+        result = simplify.remove_overlaps(shapes, statistics)
+        self.assertEqual(result, [
+            Group([Line(Point(4, 0), Point(0, 0)), Circle(Point(0, 0), 1)]),
+            Line(Point(3, 0), Point(5, 0)),
+            Line(Point(1, 0), Point(2, 0), thick=True),
+        ])
+        self.assertEqual(statistics, {'duplicates': 2, 'covered': 1})
+
+    def test_same_object(self):
+        # the first occurrence of an object is kept
+        line = Line(Point(0, 0), Point(1, 0))
+        circle = Circle(Point(0, 0), 1)
+        self.assertEqual(simplify.remove_overlaps([line, line]), [line])
+        self.assertEqual(
+            simplify.remove_overlaps([circle, Group([circle, line])]),
+            [circle, Group([line])])
+
+    def test_shared_border(self):
+        aaimg = AsciiArtImage(u'AAAABBBB\nAAAABBBB', {'remove_overlaps': True})
+        aaimg.recognize()
+        self.assertEqual(aaimg.statistics, {'duplicates': 4, 'covered': 0})
+
+    def test_box_sides(self):
+        aaimg = AsciiArtImage(u'+---+\n|   ++\n+---++', {'boxes': True, 'remove_overlaps': True})
+        aaimg.recognize()
+        # the '+' on the box sides are not joined along the sides
+        self.assertEqual(aaimg.statistics['covered'], 0)
+        self.assertEqual(len([shape for shape in flatten(aaimg.shapes) if isinstance(shape, Line)]), 3)
+
+
+if __name__ == '__main__':
+    sys.stdout.write(__doc__)
+    # When this module is executed from the command-line, it runs all its tests
+    unittest.main()
@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+#
+# This file is part of aafigure. https://github.com/aafigure/aafigure
+# (C) 2017 Chris Liechti <cliechti@gmx.net>
+#
+# SPDX-License-Identifier:    BSD-3-Clause
+"""
+Test the spatial index.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import unittest
+from aafigure.aafigure import AsciiArtImage
+from aafigure.shapes import Circle, Group, Label, Line, Point
+from aafigure.spatial import SpatialIndex
+
+
+class TestSpatialIndex(unittest.TestCase):
+
+    def test_search(self):
+        shapes = [
+            Line((0, 0), (100, 0)),
+            Circle((50, 50), 1),
+            Group([Line((10, 10), (11, 11)), Label(Point(12, 14), 'text')]),
+            Group(),
+        ]
+        index = SpatialIndex(shapes, 16, 16)
+        self.assertEqual(index.search(40, -5, 45, 5), shapes[:1])
+        self.assertEqual(index.search(45, 45, 60, 60), shapes[1:2])
+        self.assertEqual(index.search(15, 13, 15, 13), shapes[2:3])
+        self.assertEqual(index.search(20, 20, 30, 30), [])
+        self.assertEqual(index.search(1000, 1000, -1000, -1000), shapes[:3])
+        self.assertEqual(index.hit(11.5, 11.5, 1), shapes[2:3])
+        self.assertEqual(index.bounding_box(), (0, 0, 100, 51))
+
+    def test_image(self):
+        aaimg = AsciiArtImage(u'--- "label"\n\n' * 20 + u'  *', {'spatial_index': True})
+        aaimg.recognize()
+        width, height = aaimg.character_size()
+        self.assertEqual(len(aaimg.index.search(0, 0, 100 * width, 100 * height)), len(aaimg.shapes))
+        # the circle in the last row
+        found = aaimg.index.search(0, 40 * height, 10 * width, 41 * height)
+        self.assertEqual(found, [aaimg.shapes[-1]])
+
+
+if __name__ == '__main__':
+    sys.stdout.write(__doc__)
+    # When this module is executed from the command-line, it runs all its tests
+    unittest.main()
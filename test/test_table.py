@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+#
+# This file is part of aafigure. https://github.com/aafigure/aafigure
+# (C) 2017 Chris Liechti <cliechti@gmx.net>
+#
+# SPDX-License-Identifier:    BSD-3-Clause
+"""
+Test the columnar representation of shapes.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import pickle
+import unittest
+from aafigure.aafigure import AsciiArtImage
+from aafigure.shapes import Circle, Group, Label, Line, Point, Polyline
+from aafigure import table
+
+
+TEXT = u"""\
++---+  --->  "quoted"  o
+|   |  XXX      /--\\  *
++---+  AAA      \\--/  ==
+"""
+
+
+class TestShapeTable(unittest.TestCase):
+
+    def test_round_trip(self):
+        for options in ({}, {'boxes': True, 'merge_lines': True, 'merge_borders': True}):
+            aaimg = AsciiArtImage(TEXT, options)
+            aaimg.recognize()
+            shapes_table = table.ShapeTable.from_shapes(aaimg.shapes)
+            self.assertEqual(shapes_table.to_shapes(), aaimg.shapes)
+            copy = pickle.loads(pickle.dumps(shapes_table))
+            self.assertEqual(copy.to_shapes(), aaimg.shapes)
+
+    def test_groups(self):
+        shapes = [
+            Group([Line((0, 0), (1, 1)), Group([Circle((1, 1), 2), Group()])]),
+            Label(Point(3, 4), u'text'),
+            Polyline([(0, 0), (1, 0), (1, 1)], closed=True, thick=True),
+            Group(),
+        ]
+        shapes_table = table.ShapeTable.from_shapes(shapes)
+        self.assertEqual(len(shapes_table), 8)
+        self.assertEqual(shapes_table.count(table.KIND_GROUP), 4)
+        self.assertEqual(list(shapes_table.group_parent), [0, 1, 2, 0])
+        self.assertEqual(list(shapes_table.circle_group), [2])
+        self.assertEqual(shapes_table.to_shapes(), shapes)
+
+    def test_transform(self):
+        shapes_table = table.ShapeTable.from_shapes([Line((0, 0), (1, 2)), Circle((1, 1), 2)])
+        shapes_table.transform(2, 3, 10, 20)
+        self.assertEqual(
+            shapes_table.to_shapes(),
+            [Line((10, 20), (12, 26)), Circle((12, 23), 6)])
+
+    def test_convert(self):
+        shapes_table = table.ShapeTable.from_shapes([Line((0, 0), (1, 2)), Label(Point(3, 4), u'a')])
+        line, label = shapes_table.to_shapes(int)
+        self.assertEqual(line, Line((0, 0), (1, 2)))
+        self.assertTrue(isinstance(line.end.y, int) and isinstance(label.position.x, int))
+
+
+if __name__ == '__main__':
+    sys.stdout.write(__doc__)
+    # When this module is executed from the command-line, it runs all its tests
+    unittest.main()